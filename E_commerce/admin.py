@@ -11,7 +11,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'available')
+    list_display = ('name', 'category', 'price', 'stock', 'available')
     list_filter = ('category', 'available',)
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
@@ -23,7 +23,8 @@ class ProductAdmin(admin.ModelAdmin):
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
-    readonly_fields = ('product', 'quantity', 'price', 'subtotal')
+    readonly_fields = ('product_name', 'quantity', 'price', 'subtotal')
+    fields = ('product_name', 'quantity', 'price', 'subtotal')
     can_delete = False
     extra = 0
 
@@ -34,9 +35,12 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ('full_name', 'phone', 'city')
     inlines = [OrderItemInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_items()
+
     def get_products(self, obj):
         items = obj.items.all()
-        return ", ".join([item.product.name for item in items]) if items else "No products"
+        return ", ".join([item.product_name for item in items]) if items else "No products"
 
     get_products.short_description = "Products Ordered"
 
@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
-from .models import Profile,Product
+from .models import Category,Profile,Product
 
 class UserRegistrationForm(UserCreationForm):
     email = forms.EmailField(
@@ -87,12 +87,54 @@ class ProfileForm(forms.ModelForm):
 class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
-        fields = ['name', 'category', 'price', 'available', 'description', 'image']
+        fields = ['name', 'category', 'price', 'stock', 'available', 'description', 'image']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'category': forms.Select(attrs={'class': 'form-select'}),
             'price': forms.NumberInput(attrs={'class': 'form-control'}),
+            'stock': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Leave blank to not track stock'}),
             'available': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
             'image': forms.ClearableFileInput(attrs={'class': 'form-control'}),
         }
+
+class ProductFilterForm(forms.Form):
+    SORT_CHOICES = [
+        ('-created_at', 'Newest'),
+        ('name', 'Name (A-Z)'),
+        ('-name', 'Name (Z-A)'),
+        ('price', 'Price (low to high)'),
+        ('-price', 'Price (high to low)'),
+        ('stock', 'Stock (low to high)'),
+    ]
+    AVAILABILITY_CHOICES = [('', 'Any availability'), ('yes', 'Available'), ('no', 'Hidden')]
+
+    q = forms.CharField(required=False, widget=forms.TextInput(
+        attrs={'class': 'form-control form-control-sm', 'placeholder': 'Search name'}))
+    category = forms.ModelChoiceField(
+        queryset=Category.objects.order_by('name'), required=False, empty_label='All categories',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    available = forms.ChoiceField(choices=AVAILABILITY_CHOICES, required=False,
+                                  widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    min_price = forms.DecimalField(required=False, min_value=0, widget=forms.NumberInput(
+        attrs={'class': 'form-control form-control-sm', 'placeholder': 'Min ₹'}))
+    max_price = forms.DecimalField(required=False, min_value=0, widget=forms.NumberInput(
+        attrs={'class': 'form-control form-control-sm', 'placeholder': 'Max ₹'}))
+    sort = forms.ChoiceField(choices=SORT_CHOICES, required=False,
+                             widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+
+    def filter(self, queryset):
+        """Apply whichever filters are valid; a bad field is ignored, not fatal."""
+        self.is_valid()
+        data = self.cleaned_data
+        if data.get('q'):
+            queryset = queryset.filter(name__icontains=data['q'])
+        if data.get('category'):
+            queryset = queryset.filter(category=data['category'])
+        if data.get('available'):
+            queryset = queryset.filter(available=data['available'] == 'yes')
+        if data.get('min_price') is not None:
+            queryset = queryset.filter(price__gte=data['min_price'])
+        if data.get('max_price') is not None:
+            queryset = queryset.filter(price__lte=data['max_price'])
+        return queryset.order_by(data.get('sort') or '-created_at', '-id')
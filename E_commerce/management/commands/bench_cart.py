@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from E_commerce.models import Product
+from E_commerce.utils.benchmark import scratch_database, seed_products, summarize
+
+BACKENDS = {
+    'cookie': {'CART_STORAGE': 'cookie'},
+    'cache': {'CART_STORAGE': 'cache'},
+    'session (db)': {'CART_STORAGE': 'session', 'SESSION_ENGINE': 'django.contrib.sessions.backends.db'},
+    'session (cache)': {'CART_STORAGE': 'session', 'SESSION_ENGINE': 'django.contrib.sessions.backends.cache'},
+}
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = "Measure add-to-cart latency, throughput and SQL writes for each cart storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            seed_products(options['products'])
+            slugs = list(Product.objects.values_list('slug', flat=True))
+            for name, overrides in BACKENDS.items():
+                with override_settings(**overrides):
+                    self.bench(name, slugs, options)
+
+    def bench(self, name, slugs, options):
+        rng = random.Random(options['seed'])
+        client = Client()
+        urls = [reverse('add_to_cart', args=[rng.choice(slugs[:20])]) for _ in range(options['requests'])]
+        samples = []
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for url in urls:
+                t = time.perf_counter()
+                client.post(url)
+                samples.append((time.perf_counter() - t) * 1000)
+            elapsed = time.perf_counter() - start
+        writes = sum(1 for q in queries if q['sql'].split()[0] in WRITES)
+        ms = summarize(samples)
+        self.stdout.write(
+            f"{name:<16} p50={ms['p50']:6.2f}ms p95={ms['p95']:6.2f}ms "
+            f"{len(urls) / elapsed:7.0f} req/s  "
+            f"{len(queries) / len(urls):.1f} queries/req  {writes / len(urls):.1f} writes/req"
+        )
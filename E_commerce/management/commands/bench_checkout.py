@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from E_commerce.models import Order, OrderItem, Product
+from E_commerce.utils.benchmark import measure, scratch_database, seed_products, summarize
+from E_commerce.utils.orders import create_order
+
+SHIPPING = {
+    'full_name': "Bench Buyer", 'phone': "9876543210", 'address_line1': "1 Bench Street",
+    'address_line2': "", 'city': "Chennai", 'state': "TN", 'postal_code': "600001",
+}
+
+
+def legacy_place_order(cart, shipping):
+    """The per-line query pattern place_order used before the order service."""
+    total = 0
+    for product_id, quantity in cart.items():
+        total += Product.objects.get(id=int(product_id)).price * int(quantity)
+    order = Order.objects.create(total_amount=total, **shipping)
+    for product_id, quantity in cart.items():
+        product = Product.objects.get(id=int(product_id))
+        OrderItem.objects.create(order=order, product=product, quantity=quantity,
+                                 price=product.price, subtotal=product.price * int(quantity))
+    return order
+
+
+class Command(BaseCommand):
+    help = "Compare queries and latency of order placement for carts of different sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 100])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_products(max(options['lines']))
+            product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+
+            for lines in options['lines']:
+                cart = {str(pid): 2 for pid in product_ids[:lines]}
+                for label, place in (("legacy", legacy_place_order), ("service", create_order)):
+                    with CaptureQueriesContext(connection) as ctx:
+                        place(cart, SHIPPING)
+                    timings = summarize(measure(lambda: place(cart, SHIPPING), options['repeat']))
+                    self.stdout.write(
+                        f"{lines:>4} lines  {label:<8} {len(ctx):>4} queries  "
+                        f"p50={timings['p50']:8.2f}ms  p95={timings['p95']:8.2f}ms"
+                    )
@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from E_commerce.models import Order
+from E_commerce.utils.benchmark import scratch_database, seed_orders, seed_products
+from E_commerce.utils.invoice import generate_invoice_pdf, render_invoices, render_merged_invoices
+
+
+class Command(BaseCommand):
+    help = "Measure invoice rendering throughput: per-order vs. batch vs. process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--items', type=int, default=5)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:<28} {count:>6} invoices  {elapsed:7.2f}s  {count / elapsed:8.1f} invoices/sec")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_products(max(200, options['items'] * 10))
+            seed_orders(options['orders'], items_per_order=options['items'])
+            orders = Order.objects.order_by('id')
+            count = options['orders']
+
+            start = time.perf_counter()
+            for order in orders:
+                generate_invoice_pdf(order)
+            self.report("one at a time", count, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in render_invoices(orders, workers=1):
+                pass
+            self.report("batch, 1 process", count, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            connections.close_all()
+            for _ in render_invoices(orders, workers=options['workers']):
+                pass
+            self.report(f"batch, {options['workers']} processes", count, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            render_merged_invoices(orders)
+            self.report("merged document", count, time.perf_counter() - start)
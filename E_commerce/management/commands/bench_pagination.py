@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from E_commerce.models import Product
+from E_commerce.utils.benchmark import measure, scratch_database, seed_products, summarize
+from E_commerce.utils.pagination import KeysetPaginator
+
+PER_PAGE = 12
+
+
+class Command(BaseCommand):
+    help = "Compare deep-page latency of OFFSET pagination with keyset (cursor) pagination."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200_000)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_products(options['products'])
+            qs = Product.objects.filter(available=True)
+            ordering = ('-created_at', '-id')
+            keyset = KeysetPaginator(qs, PER_PAGE, ordering)
+
+            for number in options['pages']:
+                if (number - 1) * PER_PAGE >= options['products']:
+                    continue
+                # The cursor a reader would hold after paging to ``number`` (setup, untimed).
+                cursor = None
+                if number > 1:
+                    anchor = qs.order_by(*ordering)[(number - 1) * PER_PAGE - 1]
+                    cursor = keyset.encode_cursor(anchor, 'next')
+
+                def offset_page():
+                    page = Paginator(qs.order_by(*ordering), PER_PAGE).get_page(number)
+                    list(page.object_list)
+
+                def keyset_page():
+                    keyset.get_page(cursor)
+
+                offset_ms = summarize(measure(offset_page, options['repeat']))
+                keyset_ms = summarize(measure(keyset_page, options['repeat']))
+                self.stdout.write(
+                    f"page {number:>6}  OFFSET+COUNT p50={offset_ms['p50']:8.2f}ms p95={offset_ms['p95']:8.2f}ms  "
+                    f"keyset p50={keyset_ms['p50']:8.2f}ms p95={keyset_ms['p95']:8.2f}ms"
+                )
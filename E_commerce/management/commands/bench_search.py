@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from E_commerce.models import Product
+from E_commerce.utils.benchmark import measure, scratch_database, seed_products, summarize
+from E_commerce.utils.search import get_search_backend
+
+QUERIES = ('shirt', 'wireless mou', 'leather wallet', 'coffee grind')
+
+
+class Command(BaseCommand):
+    help = "Compare icontains scans with the search index at increasing catalog sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with scratch_database():
+            seeded = 0
+            for size in sorted(options['sizes']):
+                seed_products(size - seeded, start=seeded)
+                seeded = size
+                backend.rebuild(batch_size=5000)
+
+                for query in QUERIES:
+                    def scan():
+                        qs = Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))
+                        qs.count()
+                        list(qs[:12])
+
+                    def indexed():
+                        results = backend.search(query)
+                        results.count()
+                        results[:12]
+
+                    scan_ms = summarize(measure(scan, options['repeat']))
+                    index_ms = summarize(measure(indexed, options['repeat']))
+                    self.stdout.write(
+                        f"{size:>9} products  {query!r:<18} "
+                        f"icontains p50={scan_ms['p50']:8.2f}ms p95={scan_ms['p95']:8.2f}ms  "
+                        f"index p50={index_ms['p50']:8.2f}ms p95={index_ms['p95']:8.2f}ms"
+                    )
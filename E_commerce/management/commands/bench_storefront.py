@@ -0,0 +1,207 @@
+import contextlib
+import json
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from E_commerce.models import Order, Product
+from E_commerce.utils import catalog_cache
+from E_commerce.utils.benchmark import WORDS, scratch_database, seed_orders, seed_products, summarize
+from E_commerce.utils.pagination import KeysetPaginator
+from E_commerce.utils.search import get_search_backend
+
+SHIPPING = {
+    'full_name': "Bench Buyer", 'phone': "9876543210", 'address_line1': "1 Bench Street",
+    'address_line2': "", 'city': "Chennai", 'state': "TN", 'postal_code': "600001",
+}
+
+
+class Flows:
+    """One method per storefront flow. Each does its setup untimed and returns
+    the request to measure as a zero-argument callable."""
+
+    names = ('product_list', 'search_products', 'add_to_cart', 'checkout', 'place_order', 'download_invoice')
+
+    def __init__(self, seed, pages=1):
+        self.rng = random.Random(seed)
+        self.client = Client()
+        self.slugs = list(Product.objects.order_by('id').values_list('slug', flat=True))
+        self.order_ids = iter(Order.objects.order_by('id').values_list('id', flat=True))
+        self.pages = self._page_cursors(pages)
+
+    def _page_cursors(self, pages):
+        # The cursors of the first listing pages, as the "next" links give them.
+        paginator = KeysetPaginator(Product.objects.filter(available=True), 12)
+        cursors = [None]
+        while len(cursors) < pages:
+            page = paginator.get_page(cursors[-1])
+            if not page.has_next:
+                break
+            cursors.append(page.next_cursor)
+        return cursors
+
+    def _fill_cart(self, lines=3):
+        self.client.cookies.clear()
+        for slug in self.rng.sample(self.slugs, lines):
+            self.client.post(reverse('add_to_cart', args=[slug]))
+
+    def product_list(self):
+        cursor = self.rng.choice(self.pages)
+        return lambda: self.client.get(reverse('product_list'), {'cursor': cursor} if cursor else {})
+
+    def search_products(self):
+        query = ' '.join(self.rng.sample(WORDS, 2))
+        return lambda: self.client.get(reverse('search_products'), {'q': query})
+
+    def add_to_cart(self):
+        url = reverse('add_to_cart', args=[self.rng.choice(self.slugs)])
+        return lambda: self.client.post(url)
+
+    def checkout(self):
+        self._fill_cart()
+        return lambda: self.client.post(reverse('checkout'), SHIPPING)
+
+    def place_order(self):
+        self._fill_cart()
+        return lambda: self.client.post(reverse('place_order'), SHIPPING)
+
+    def download_invoice(self):
+        # A fresh order each time: the invoice is rendered on the request.
+        order_id = next(self.order_ids)
+
+        def request():
+            with override_settings(BACKGROUND_TASKS='sync'):
+                response = self.client.get(reverse('download_invoice', args=[order_id]))
+            if response.status_code != 200:  # pending or failed: not a rendered invoice
+                raise CommandError(f"download_invoice returned {response.status_code}")
+            b''.join(response.streaming_content)
+            response.close()
+            return response
+        return request
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the storefront flows end to end through the test client on a seeded "
+        "scratch database: p50/p95 latency, queries per request, catalog cache hits and "
+        "misses and throughput per flow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flows', nargs='+', choices=Flows.names, default=list(Flows.names))
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per flow.")
+        parser.add_argument('--warmup', type=int, default=10, help="Untimed requests per flow first.")
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--pages', type=int, default=20,
+                            help="Listing pages product_list spreads its requests over.")
+        parser.add_argument('--cold-cache', action='store_true',
+                            help="Clear the catalog cache before every timed request.")
+        parser.add_argument('--current-database', action='store_true',
+                            help="Seed and measure the configured database instead of a scratch one. "
+                                 "Only for a disposable database, such as inside a test.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--label', default='', help="Stored in the JSON, e.g. a commit id.")
+        parser.add_argument('--json', metavar='PATH', help="Write the results as JSON ('-' for stdout).")
+        parser.add_argument('--compare', metavar='PATH', help="Earlier --json output to show changes against.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)['flows']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Can't read {options['compare']}: {exc}")
+
+        media_root = tempfile.mkdtemp()
+        # Invoices stay off the request path except where download_invoice asks for them.
+        overrides = override_settings(ALLOWED_HOSTS=['testserver'], MEDIA_ROOT=media_root,
+                                      BACKGROUND_TASKS='worker', PERF_SLOW_QUERY_MS=float('inf'))
+        database = contextlib.nullcontext() if options['current_database'] else scratch_database()
+        try:
+            with database, overrides:
+                results = self.run(options)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        report = {
+            'label': options['label'],
+            'config': {key: options[key] for key in ('requests', 'warmup', 'products', 'pages', 'cold_cache', 'seed')},
+            'flows': results,
+        }
+        if options['json'] == '-':
+            json.dump(report, self.stdout, indent=2, sort_keys=True)
+            self.stdout.write('')
+            return
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        self.print_table(results, baseline)
+
+    def run(self, options):
+        seed_products(options['products'], seed=options['seed'])
+        get_search_backend().rebuild(batch_size=5000)
+        runs = options['warmup'] + options['requests']
+        if 'download_invoice' in options['flows']:
+            seed_orders(runs, seed=options['seed'])
+        catalog_cache.get_cache().clear()
+
+        results = {}
+        for name in options['flows']:
+            flows = Flows(options['seed'], options['pages'])
+            flow = getattr(flows, name)
+            for _ in range(options['warmup']):
+                flow()()
+            samples, query_counts = [], []
+            hits = misses = 0
+            for _ in range(options['requests']):
+                request = flow()
+                if options['cold_cache']:
+                    catalog_cache.get_cache().clear()
+                before = catalog_cache.stats()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = request()
+                    samples.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    raise CommandError(f"{name} returned {response.status_code}")
+                query_counts.append(len(queries))
+                after = catalog_cache.stats()
+                hits += after['hits'] - before['hits']
+                misses += after['misses'] - before['misses']
+            ms = summarize(samples)
+            results[name] = {
+                'requests': len(samples),
+                'p50_ms': round(ms['p50'], 3),
+                'p95_ms': round(ms['p95'], 3),
+                'mean_ms': round(ms['mean'], 3),
+                'queries_per_request': round(sum(query_counts) / len(query_counts), 2),
+                'max_queries': max(query_counts),
+                'cache_hits': hits,
+                'cache_misses': misses,
+                'throughput_rps': round(len(samples) / (sum(samples) / 1000), 1),
+            }
+        return results
+
+    def print_table(self, results, baseline):
+        def change(name, key):
+            old = (baseline or {}).get(name, {}).get(key)
+            if not old:
+                return ''
+            return f" ({(results[name][key] - old) / old:+.0%})"
+
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<17} p50={row['p50_ms']:8.2f}ms{change(name, 'p50_ms'):<7} "
+                f"p95={row['p95_ms']:8.2f}ms{change(name, 'p95_ms'):<7} "
+                f"{row['queries_per_request']:5.1f} queries/req{change(name, 'queries_per_request'):<7} "
+                f"{row['throughput_rps']:7.1f} req/s  "
+                f"cache {row['cache_hits']} hits/{row['cache_misses']} misses"
+            )
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from E_commerce.utils.recommendations import TOP_K, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the \"frequently bought together\" table from every order: count "
+        "co-purchases with a sparse product x product matrix and keep each product's "
+        "top partners. Checkouts keep it current in between; run it nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=TOP_K, help=f"Partners kept per product (default {TOP_K}).")
+        parser.add_argument('--min-count', type=int, default=1, help="Ignore pairs bought together fewer times.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['top'] < 1 or options['min_count'] < 1:
+            raise CommandError("--top and --min-count must be at least 1.")
+        start = time.perf_counter()
+        total = rebuild(k=options['top'], min_count=options['min_count'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {total} co-purchase pairs in {time.perf_counter() - start:.2f}s."
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from E_commerce.utils.similarity import BLOCK_CELLS, TOP_K, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the \"similar products\" table: TF-IDF vectors of every product's name and "
+        "description, cosine top-k neighbours computed in blocks. Between runs, product edits "
+        "through the site refresh just that product; run it after imports and nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=TOP_K, help=f"Neighbours kept per product (default {TOP_K}).")
+        parser.add_argument('--block-cells', type=int, default=BLOCK_CELLS,
+                            help="Similarity scores held in memory at once (4 bytes each).")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['top'] < 1 or options['block_cells'] < 1:
+            raise CommandError("--top and --block-cells must be at least 1.")
+        start = time.perf_counter()
+        total = rebuild(k=options['top'], block_cells=options['block_cells'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {total} similar-product pairs in {time.perf_counter() - start:.2f}s."
+        ))
@@ -0,0 +1,80 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from E_commerce.models import CoPurchase, Order, OrderItem, Product, SimilarProduct
+from E_commerce.utils.invoice_queue import Status
+from E_commerce.utils.pagination import KeysetPaginator
+from E_commerce.utils.slugs import _family
+
+PER_PAGE = 12
+
+# Plan lines that mean "reads the whole table" or "sorts the result set".
+# "SCAN t USING INDEX i" is an ordered index walk stopped by LIMIT, so it passes.
+BAD_PLAN = {
+    'sqlite': re.compile(r'\bSCAN \S+$|USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'Seq Scan|\bSort\b'),
+}
+
+
+def hot_queries():
+    """The querysets behind the busiest pages, with representative parameters."""
+    now = timezone.now()
+    live = Product.objects.filter(available=True)
+    listing = KeysetPaginator(live, PER_PAGE)
+    by_category = live.filter(category_id=1)
+    return {
+        'product_list': live.order_by('-created_at', '-id')[:PER_PAGE + 1],
+        'product_list (cursor)': live.filter(listing._after([now, 1], reverse=False))
+        .order_by('-created_at', '-id')[:PER_PAGE + 1],
+        'product_list_by_category': by_category.order_by('-created_at', '-id')[:PER_PAGE + 1],
+        'product_list_by_category (cursor)': by_category.filter(listing._after([now, 1], reverse=False))
+        .order_by('-created_at', '-id')[:PER_PAGE + 1],
+        'category_detail (cursor)': by_category.filter(id__lt=1000).order_by('-id')[:9],
+        'product_detail': live.filter(slug='example'),
+        'slug allocation': Product.objects.filter(_family('slug', 'example')).values_list('slug'),
+        'cart pricing': Product.objects.filter(pk__in=[1, 2, 3]),
+        'order items': OrderItem.objects.filter(order_id__in=[1, 2, 3]),
+        'orders by date': Order.objects.filter(created_at__gte=now).order_by('created_at'),
+        'orders by phone': Order.objects.filter(phone='9876543210'),
+        'bought together': CoPurchase.objects.filter(product_id=1, other__available=True)
+        .select_related('other').order_by('-count', 'other_id')[:4],
+        'similar products': SimilarProduct.objects.filter(product_id=1, other__available=True)
+        .select_related('other').order_by('-score', 'other_id')[:4],
+        'invoice queue': Order.objects.filter(invoice_status=Status.PENDING).order_by('id')[:50],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot catalog and order queries and fail if any of them "
+        "needs a full table scan or an in-memory sort."
+    )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in BAD_PLAN:
+            raise CommandError(f"Don't know how to read {vendor} query plans.")
+
+        failures = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # Small dev tables make a seq scan the cheapest plan; forbid it
+                # so the plan shows whether a usable index exists at all.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, queryset in hot_queries().items():
+                plan = queryset.explain()
+                bad = [line for line in plan.splitlines() if BAD_PLAN[vendor].search(line)]
+                if bad:
+                    failures.append(name)
+                self.stdout.write(f"{'FAIL' if bad else 'ok  '} {name}")
+                if bad or options['verbosity'] > 1:
+                    for line in plan.splitlines():
+                        self.stdout.write(f"       {line}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries are not index-backed: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries are index-backed."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from E_commerce.utils.catalog_io import FORMATS, export_rows, guess_format, write_rows
+
+
+class Command(BaseCommand):
+    help = "Stream every product to CSV or JSONL in a form import_catalog reads back."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="File to write, or - for stdout (default).")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension (csv otherwise).")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = guess_format(path, options['format'])
+        start = time.perf_counter()
+        if path == '-':
+            write_rows(self.stdout, export_rows(), fmt)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as stream:
+            total = write_rows(stream, export_rows(), fmt)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Exported {total} products to {path} in {elapsed:.2f}s"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from E_commerce.models import Category, Product
+from E_commerce.utils.images import generate_thumbnails, needs_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Build missing or stale image thumbnails for products and categories. "
+        "Use it to backfill, after bulk imports, or as the worker when BACKGROUND_TASKS='worker'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild even up-to-date thumbnails.")
+
+    def handle(self, *args, **options):
+        for model in (Category, Product):
+            label = model._meta.label
+            done = 0
+            rows = model.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'thumbnails')
+            for instance in rows.iterator(chunk_size=500):
+                if options['force']:
+                    model.objects.filter(pk=instance.pk).update(thumbnails={})
+                elif not needs_thumbnails(instance):
+                    continue
+                done += generate_thumbnails(label, instance.pk)
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {done} thumbnailed")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from E_commerce.models import Product
+from E_commerce.utils import catalog_cache
+from E_commerce.utils.catalog_io import (
+    FORMATS, CategoryMap, RowError, batched, guess_format, product_from_row, read_rows, upsert_products,
+)
+from E_commerce.utils.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream products from CSV or JSONL and upsert them by slug in batches. "
+        "Categories are matched by slug and created if missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension (csv otherwise).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = guess_format(path, options['format'])
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        categories = CategoryMap()
+        search = get_search_backend()
+        total = indexed = 0
+        start = time.perf_counter()
+        try:
+            # bulk_create sends no model signals, so the search index and
+            # cache updates the receivers would make are done here per batch.
+            for batch in batched(read_rows(stream, fmt), options['batch_size']):
+                with transaction.atomic():
+                    categories.resolve(row for _, row in batch)
+                    products = upsert_products([product_from_row(line, row, categories) for line, row in batch])
+                    # Reread: a partial row leaves the stored description in place.
+                    touched = list(Product.objects.filter(slug__in=[p.slug for p in products])
+                                   .only('id', 'name', 'description'))
+                    search.index(touched)
+                total += len(batch)
+                indexed += len(touched)
+                catalog_cache.invalidate_catalog(product_slugs=[p.slug for p in products])
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"  {total} rows")
+        except RowError as exc:
+            raise CommandError(f"{path}, {exc} ({total} rows before it were imported)") from exc
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - start
+
+        catalog_cache.invalidate_catalog(category_ids=categories.ids.values())
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/s); reindexed {indexed} products."
+        ))
@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from E_commerce.utils.invoice_queue import pending_invoice_ids, render_invoice, requeue_stale
+
+
+def _setup_process():
+    django.setup()
+
+
+def _render(order_id):
+    try:
+        return render_invoice(order_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Render queued invoices in the background (the DB-backed invoice queue)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help="Render in a pool of this many processes.")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit.")
+
+    def handle(self, *args, **options):
+        pool = None
+        if options['processes'] > 1:
+            connections.close_all()  # never share a connection with forked children
+            pool = ProcessPoolExecutor(max_workers=options['processes'], initializer=_setup_process)
+
+        rendered = 0
+        try:
+            while True:
+                requeue_stale()
+                ids = pending_invoice_ids(options['batch_size'])
+                if not ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                if pool:
+                    connections.close_all()
+                    results = list(pool.map(_render, ids))
+                else:
+                    results = [render_invoice(order_id) for order_id in ids]
+                rendered += sum(1 for ok in results if ok)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} invoices"))
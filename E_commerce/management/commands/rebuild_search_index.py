@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from E_commerce.utils.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = get_search_backend().rebuild(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products in {elapsed:.2f}s"))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from E_commerce.models import Order
+from E_commerce.utils.sales import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily sales rollups from order items and fix any drift. "
+        "Meant to run nightly; by default it checks yesterday and today."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help="Check the last N days (default 2).")
+        parser.add_argument('--since', help="First date to check (YYYY-MM-DD); overrides --days.")
+        parser.add_argument('--until', help="Last date to check (YYYY-MM-DD, default today).")
+        parser.add_argument('--all', action='store_true', help="Check everything since the first order.")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it.")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        last = self._date(options['until']) if options['until'] else today
+        if options['all']:
+            first_order = Order.objects.aggregate(first=Min('created_at'))['first']
+            first = timezone.localdate(first_order) if first_order else today
+        elif options['since']:
+            first = self._date(options['since'])
+        else:
+            first = last - timedelta(days=options['days'] - 1)
+        if first > last:
+            raise CommandError("The range is empty.")
+
+        drift = reconcile(first, last, dry_run=options['dry_run'])
+        verb = "to fix" if options['dry_run'] else "fixed"
+        for table, count in drift.items():
+            self.stdout.write(f"{table}: {count} rows {verb}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {first} to {last}."))
+
+    def _date(self, value):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Not a YYYY-MM-DD date: {value}")
+        return day
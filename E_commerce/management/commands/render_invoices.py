@@ -0,0 +1,67 @@
+import os
+import time
+from datetime import date
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from E_commerce.models import Order
+from E_commerce.utils.invoice import render_invoices, render_merged_invoices
+
+
+class Command(BaseCommand):
+    help = "Bulk-render invoices for a range of orders (month-end reprints, exports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, nargs='+', help="Only these order ids.")
+        parser.add_argument('--since', type=date.fromisoformat, help="Orders created on/after YYYY-MM-DD.")
+        parser.add_argument('--until', type=date.fromisoformat, help="Orders created before YYYY-MM-DD.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--output', default='invoices_export', help="Directory for the PDFs.")
+        parser.add_argument('--merge', action='store_true', help="Write one combined PDF instead.")
+        parser.add_argument('--store', action='store_true',
+                            help="Also save each PDF on its order so downloads are served from cache.")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by('id')
+        if options['ids']:
+            orders = orders.filter(id__in=options['ids'])
+        if options['since']:
+            orders = orders.filter(created_at__date__gte=options['since'])
+        if options['until']:
+            orders = orders.filter(created_at__date__lt=options['until'])
+        if options['merge'] and options['store']:
+            raise CommandError("--store cannot be combined with --merge.")
+
+        os.makedirs(options['output'], exist_ok=True)
+        start = time.perf_counter()
+        count = 0
+
+        if options['merge']:
+            count = orders.count()
+            path = os.path.join(options['output'], 'invoices.pdf')
+            with open(path, 'wb') as fh:
+                fh.write(render_merged_invoices(orders))
+        else:
+            if options['workers'] > 1:
+                connections.close_all()  # don't hand a live connection to forked workers
+            for order_id, pdf in render_invoices(orders, workers=options['workers']):
+                with open(os.path.join(options['output'], f"invoice_{order_id}.pdf"), 'wb') as fh:
+                    fh.write(pdf)
+                if options['store']:
+                    order = Order(id=order_id)
+                    order.invoice.save(f"invoice_{order_id}.pdf", ContentFile(pdf), save=False)
+                    Order.objects.filter(id=order_id).update(
+                        invoice=order.invoice.name,
+                        invoice_status=Order.InvoiceStatus.READY,
+                        invoice_updated_at=timezone.now(),
+                    )
+                count += 1
+
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {count} invoices in {elapsed:.2f}s ({rate:.1f} invoices/sec)"
+        ))
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import connection
+
+from .utils import perf
+from .utils.cart import Cart
+
+
+class PerformanceMiddleware:
+    """Times every request: wall time, queries and time in the database, and
+    the spans opened with ``perf.timed`` (templates).
+
+    The numbers go out in a ``Server-Timing`` header (with DEBUG on, or to
+    staff on pages that looked at the user; they tell too much about the
+    backend to send to everyone), queries slower than
+    ``PERF_SLOW_QUERY_MS`` are logged with the view that ran them, and
+    per-view aggregates are kept for the ``perf_stats`` endpoint. Goes first
+    in MIDDLEWARE so the other middleware's queries are counted too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with perf.recording(request) as timings, connection.execute_wrapper(timings.execute_wrapper):
+            response = self.get_response(request)
+        total_ms = timings.elapsed_ms()
+        perf.stats.record(timings.view_name, timings, total_ms)
+        # Only a user the request already loaded: resolving request.user here
+        # would add a session read and a user query to every response.
+        user = getattr(request, '_cached_user', None)
+        if getattr(settings, 'PERF_SERVER_TIMING', True) and (settings.DEBUG or getattr(user, 'is_staff', False)):
+            response['Server-Timing'] = timings.server_timing(total_ms)
+        return response
+
+
+class CartMiddleware:
+    """Puts ``request.cart`` on every request and saves it once on the way out.
+
+    Must come after AuthenticationMiddleware: where the cart is stored
+    depends on whether the user is signed in.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.cart = Cart(request)
+        response = self.get_response(request)
+        request.cart.persist(response)
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:06
+
+from django.db import migrations
+
+from E_commerce.utils.search import SQLiteFTSBackend
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Product = apps.get_model('E_commerce', 'Product')
+    backend = SQLiteFTSBackend()
+    with schema_editor.connection.cursor() as cursor:
+        backend.create_table(cursor)
+        rows = list(Product.objects.values_list('id', 'name', 'description'))
+        if rows:
+            backend._insert(cursor, rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        SQLiteFTSBackend().drop_table(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('E_commerce', '0006_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('E_commerce', '0007_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='invoice_status',
+            field=models.CharField(blank=True, choices=[('', 'Not requested'), ('pending', 'Pending'), ('rendering', 'Rendering'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='invoice_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:09
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_snapshot(apps, schema_editor):
+    OrderItem = apps.get_model('E_commerce', 'OrderItem')
+    last_id = 0
+    while True:
+        rows = list(
+            OrderItem.objects.filter(id__gt=last_id, product__isnull=False, product_name='')
+            .order_by('id')
+            .values_list('id', 'product__name', 'product__slug')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        OrderItem.objects.bulk_update(
+            [OrderItem(id=pk, product_name=name, product_slug=slug) for pk, name, slug in rows],
+            ['product_name', 'product_slug'],
+        )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('E_commerce', '0009_orderitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop),
+    ]
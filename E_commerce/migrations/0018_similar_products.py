@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('E_commerce', '0017_co_purchases'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='E_commerce.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar', to='E_commerce.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score', 'other'], name='similar_product_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'other'), name='similar_product_unique_pair')],
+            },
+        ),
+    ]
@@ -1,16 +1,26 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 from django.utils.text import slugify
 from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-import sys
+from .utils import catalog_cache
+from .utils.search import get_search_backend
+from .utils.images import generate_thumbnails, needs_thumbnails
+from .utils.signals import unless_suspended
+from .utils.similarity import queue_refresh
+from .utils.slugs import unique_slug
+from .utils.tasks import run_in_background
 
 class Category(models.Model):
     name = models.CharField(max_length=120)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # Filled in by utils/images.py after upload: {'source', 'src', 'jpeg', 'webp'}.
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -20,30 +30,74 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+SLUG_ATTEMPTS = 3
+
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, related_name='products', null=True, blank=True)
     name = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(blank=True)
     available = models.BooleanField(default=True)
+    # None means stock isn't tracked for this product and it never sells out.
+    stock = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # Partial indexes over available products only: Django filters booleans
+        # as a bare ``WHERE available``, which a plain composite index can't
+        # serve on SQLite, and hidden products never appear in listings anyway.
+        # (category_detail's keyset on id is served by the category FK index.)
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], condition=Q(available=True),
+                name='product_live_created_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'], condition=Q(available=True),
+                name='product_live_cat_created_idx',
+            ),
+        ]
+
+    @property
+    def in_stock(self):
+        return self.stock is None or self.stock > 0
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name)
-            slug = base_slug
-            counter = 1
-            while Product.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+        # Two saves can be handed the same free slug; the loser allocates again.
+        for attempt in range(SLUG_ATTEMPTS):
+            self.slug = unique_slug(Product, self.name)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                self.slug = ''
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
 
     def __str__(self):
         return f"{self.name} - ₹{self.price}"
 
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Load items in one extra query, whatever the page size.
+
+        Items carry a snapshot of the product name, so no join to Product is needed.
+        """
+        return self.prefetch_related('items')
+
 class Order(models.Model):
+    class InvoiceStatus(models.TextChoices):
+        NONE = '', 'Not requested'
+        PENDING = 'pending', 'Pending'
+        RENDERING = 'rendering', 'Rendering'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
     full_name = models.CharField(max_length=200)
     phone = models.CharField(max_length=20)
     address_line1 = models.CharField(max_length=255)
@@ -54,19 +108,134 @@ class Order(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     invoice = models.FileField(upload_to='invoices/', null=True, blank=True)
+    invoice_status = models.CharField(max_length=10, choices=InvoiceStatus.choices, blank=True, default='', db_index=True)
+    invoice_updated_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            models.Index(fields=['phone'], name='order_phone_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.full_name}"
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
-    product = models.ForeignKey('Product', on_delete=models.CASCADE)
+    # Kept nullable so deleting a product never deletes order history; the
+    # snapshot fields below are what listings and invoices read.
+    product = models.ForeignKey('Product', on_delete=models.SET_NULL, null=True, blank=True)
+    product_name = models.CharField(max_length=255, blank=True)
+    product_slug = models.SlugField(max_length=255, blank=True)
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal = models.DecimalField(max_digits=12, decimal_places=2)
 
+    def snapshot_product(self):
+        """Copy the product's name and slug onto the item at purchase time."""
+        if self.product is not None:
+            self.product_name = self.product.name
+            self.product_slug = self.product.slug
+
+    def save(self, *args, **kwargs):
+        if not self.product_name:
+            self.snapshot_product()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
+
+# Saved carts for signed-in users (utils/cart.py DatabaseCartStorage). The
+# cart's primary key is the user's, so items can be read by user id alone.
+class Cart(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='cart')
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Cart of {self.user}"
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    # Price when the line was added, so the cart can point out changes.
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['cart', 'product'], name='cart_item_unique_product')]
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity}"
+
+# Daily sales rollups, bumped by every checkout (see utils/sales.py) and
+# re-derived from OrderItem by the reconcile_sales command.
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: ₹{self.revenue}"
+
+class DailyProductSales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['date', 'product'], name='daily_product_sales_unique')]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: ₹{self.revenue}"
+
+class DailyCategorySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['date', 'category'], name='daily_category_sales_unique')]
+
+    def __str__(self):
+        return f"{self.date} {self.category_id}: ₹{self.revenue}"
+
+# "Frequently bought together": how many orders contained both products.
+# Rebuilt from OrderItem by the build_recommendations command (which keeps
+# the top few per product) and bumped by every checkout in between (see
+# utils/recommendations.py).
+class CoPurchase(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='co_purchases')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['product', 'other'], name='co_purchase_unique_pair')]
+        indexes = [models.Index(fields=['product', '-count', 'other'], name='co_purchase_top_idx')]
+
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
+        return f"{self.product_id} + {self.other_id}: {self.count}"
+
+# "Similar products": cosine similarity of the TF-IDF vectors of name and
+# description, top few per product. Built by build_similar_products and
+# refreshed for one product whenever its text changes (utils/similarity.py).
+class SimilarProduct(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['product', 'other'], name='similar_product_unique_pair')]
+        indexes = [models.Index(fields=['product', '-score', 'other'], name='similar_product_top_idx')]
+
+    def __str__(self):
+        return f"{self.product_id} ~ {self.other_id}: {self.score:.3f}"
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -90,8 +259,67 @@ class Profile(models.Model):
 #         instance.profile.save()
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if 'loaddata' in sys.argv:
-        return  # Skip signal when loading fixtures
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return  # Fixtures (loaddata) bring their own profiles
     if created:
-        Profile.objects.create(user=instance)
\ No newline at end of file
+        Profile.objects.create(user=instance)
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def queue_thumbnails(sender, instance, raw=False, **kwargs):
+    # Resizing takes far too long for the request; do it after commit.
+    if raw or not needs_thumbnails(instance):
+        return
+    label, pk = sender._meta.label, instance.pk
+    transaction.on_commit(lambda: run_in_background(generate_thumbnails, label, pk))
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    # CartMiddleware's cart follows the shopper into their account.
+    cart = getattr(request, 'cart', None)
+    if cart is not None:
+        cart.login()
+
+@receiver(post_save, sender=Product)
+@unless_suspended
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index([instance])
+
+@receiver(post_delete, sender=Product)
+@unless_suspended
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove([instance.id])
+
+@receiver(pre_save, sender=Product)
+@unless_suspended
+def remember_saved_product(sender, instance, raw=False, **kwargs):
+    # A product may move category or get a new slug; the old fragments must go
+    # too. Its old text tells queue_similarity_refresh whether to run.
+    instance._cached_as = instance._text_was = None
+    if instance.pk and not raw:
+        saved = Product.objects.filter(pk=instance.pk).values_list('slug', 'category_id', 'name', 'description').first()
+        if saved:
+            instance._cached_as, instance._text_was = saved[:2], saved[2:]
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@unless_suspended
+def invalidate_product_cache(sender, instance, **kwargs):
+    old_slug, old_category_id = getattr(instance, '_cached_as', None) or (None, None)
+    catalog_cache.invalidate_product(instance, old_slug, old_category_id)
+
+@receiver(post_save, sender=Product)
+@unless_suspended
+def queue_similarity_refresh(sender, instance, raw=False, **kwargs):
+    # Re-scoring against the whole catalog is too slow for the request.
+    if raw or getattr(instance, '_text_was', None) == (instance.name, instance.description):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: queue_refresh(pk))
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@unless_suspended
+def invalidate_category_cache(sender, instance, **kwargs):
+    catalog_cache.invalidate_category(instance)
@@ -1,3 +1,1135 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from PIL import Image
+
+from .management.commands.bench_storefront import Flows
+from .middleware import PerformanceMiddleware
+from .models import (
+    Cart, CartItem, Category, CoPurchase, DailyCategorySales, DailyProductSales, DailySales, Order, OrderItem, Product,
+    Profile, SimilarProduct,
+)
+from .utils import catalog_cache, orders as order_service, perf, recommendations, sales, similarity
+from .utils.inventory import OutOfStockError
+from .utils.invoice import render_invoices, render_merged_invoices
+from .utils.invoice_queue import render_invoice
+from .utils.order_export import CSV_HEADER
+from .utils.pagination import InvalidCursor, KeysetPaginator
+from .utils.search import get_search_backend
+from .utils.signals import signals_suspended
+from .utils.slugs import assign_slugs, unique_slug
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def create_order(products, **fields):
+    order = Order.objects.create(full_name="Test Buyer", phone="9876543210", address_line1="1 Main St",
+                                 city="Chennai", state="TN", postal_code="600001", **fields)
+    for product in products:
+        OrderItem.objects.create(order=order, product=product, quantity=2,
+                                 price=product.price, subtotal=product.price * 2)
+    return order
+
+
+def fill_cart(client, quantities):
+    """Put ``{product: qty}`` in the test client's cart through the cart views."""
+    for product, quantity in quantities.items():
+        client.post(reverse('add_to_cart', args=[product.slug]))
+        if quantity > 1:
+            client.post(reverse('update_cart'), {'product_id': product.id, 'action': 'update', 'quantity': quantity})
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.laptop = Product.objects.create(name="Gaming Laptop", price=Decimal('999.00'),
+                                             description="Fast and light")
+        self.sleeve = Product.objects.create(name="Sleeve", price=Decimal('19.00'),
+                                             description="Fits any laptop up to 15 inches")
+        self.mug = Product.objects.create(name="Ceramic Mug", price=Decimal('5.00'))
+
+    def search(self, query):
+        results = get_search_backend().search(query)
+        return results.count(), list(results[:10])
+
+    def test_index_follows_save_and_delete(self):
+        self.mug.name = "Enamel Mug"
+        self.mug.save()
+        self.assertEqual(self.search("enamel"), (1, [self.mug]))
+        self.assertEqual(self.search("ceramic")[0], 0)
+
+        self.mug.delete()
+        self.assertEqual(self.search("enamel")[0], 0)
+
+    def test_prefix_match_ranks_name_hits_first(self):
+        count, results = self.search("lap")
+        self.assertEqual(count, 2)
+        self.assertEqual(results, [self.laptop, self.sleeve])
+
+    def test_punctuation_only_query_matches_nothing(self):
+        self.assertEqual(self.search('"*()'), (0, []))
+
+    def test_view_redirects_on_single_hit_and_paginates(self):
+        response = self.client.get(reverse('search_products'), {'q': 'mug'})
+        self.assertRedirects(response, reverse('product_detail', args=[self.mug.slug]))
+
+        for i in range(13):
+            Product.objects.create(name=f"Laptop Stand {i}", price=Decimal('10.00'))
+        response = self.client.get(reverse('search_products'), {'q': 'laptop', 'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 15)
+        self.assertEqual(len(response.context['results']), 3)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, BACKGROUND_TASKS='worker')
+class InvoiceQueueTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Desk Lamp", price=Decimal('25.00'))
+        self.order = create_order([self.product])
+
+    def test_download_is_pending_until_worker_renders_it(self):
+        url = reverse('download_invoice', args=[self.order.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 202)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.invoice_status, Order.InvoiceStatus.PENDING)
+
+        call_command('invoice_worker', '--once', stdout=StringIO())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.invoice_status, Order.InvoiceStatus.READY)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+    def test_failed_invoice_waits_for_an_explicit_retry(self):
+        Order.objects.filter(pk=self.order.pk).update(invoice_status=Order.InvoiceStatus.FAILED)
+        url = reverse('download_invoice', args=[self.order.id])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn('Retry-After', response)
+        self.assertContains(response, 'method="post"', status_code=500)
+        self.assertEqual(callbacks, [])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.invoice_status, Order.InvoiceStatus.FAILED)
+
+        self.assertRedirects(self.client.post(url), url, target_status_code=202)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.invoice_status, Order.InvoiceStatus.PENDING)
+
+    @override_settings(BACKGROUND_TASKS='sync')
+    def test_checkout_queues_invoice_and_redirects(self):
+        fill_cart(self.client, {self.product: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('checkout'), {
+                'full_name': "Asha", 'phone': "9876543210", 'address_line1': "2 Lake Rd",
+                'city': "Madurai", 'state': "TN", 'postal_code': "625001",
+            })
+        order = Order.objects.latest('id')
+        self.assertRedirects(response, reverse('checkout_success', args=[order.id]))
+        self.assertEqual(order.invoice_status, Order.InvoiceStatus.READY)
+        self.assertTrue(order.invoice.name.endswith('.pdf'))
+        self.assertEqual(self.client.get(reverse('orders')).context['items'], [])
+
+
+class InvoiceRenderingTests(TestCase):
+    def setUp(self):
+        products = [Product.objects.create(name=f"Item {i}", price=Decimal('9.50')) for i in range(3)]
+        self.orders = [create_order(products) for _ in range(4)]
+
+    def test_batch_render_prefetches_in_constant_queries(self):
+        with self.assertNumQueries(2):
+            rendered = list(render_invoices(Order.objects.order_by('id')))
+        self.assertEqual([order_id for order_id, _ in rendered], [o.id for o in self.orders])
+        self.assertTrue(all(pdf.startswith(b"%PDF") for _, pdf in rendered))
+
+    def test_order_history_survives_product_deletion(self):
+        order = self.orders[0]
+        Product.objects.filter(name="Item 0").delete()
+        items = list(order.items.order_by('id'))
+        self.assertEqual(len(items), 3)
+        self.assertIsNone(items[0].product_id)
+        self.assertEqual(str(items[0]), "Item 0 x 2")
+        rendered = dict(render_invoices(Order.objects.filter(pk=order.pk)))
+        self.assertTrue(rendered[order.pk].startswith(b"%PDF"))
+
+    def test_merged_render_is_a_single_document(self):
+        pdf = render_merged_invoices(Order.objects.order_by('id'))
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        self.assertEqual(pdf.count(b"%%EOF"), 1)
+
+
+class OrderQueryCountTests(TestCase):
+    """Order pages must cost the same number of queries whatever their size."""
+
+    def setUp(self):
+        self.products = [Product.objects.create(name=f"Item {i}", price=Decimal('3.00')) for i in range(4)]
+        admin = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+        self.client.force_login(admin)
+
+    def count_queries(self, fn):
+        with CaptureQueriesContext(connection) as ctx:
+            fn()
+        return len(ctx)
+
+    def test_admin_changelist_queries_do_not_grow_with_page_size(self):
+        url = reverse('admin:E_commerce_order_changelist')
+        counts = {}
+        for size in (5, 50):
+            Order.objects.all().delete()
+            for _ in range(size):
+                create_order(self.products)
+            counts[size] = self.count_queries(lambda: self.client.get(url))
+        self.assertEqual(counts[5], counts[50])
+
+    def test_checkout_success_and_invoice_use_constant_queries(self):
+        order = create_order(self.products)
+        with self.assertNumQueries(2):
+            Order.objects.with_items().get(pk=order.pk).items.all()[0].product_name
+        small = self.count_queries(lambda: self.client.get(reverse('checkout_success', args=[order.id])))
+        big = create_order(self.products * 10)
+        large = self.count_queries(lambda: self.client.get(reverse('checkout_success', args=[big.id])))
+        self.assertEqual(small, large)
+
+
+class OrderServiceTests(TestCase):
+    shipping = {
+        'full_name': "Ravi", 'phone': "9876543210", 'address_line1': "3 Hill Rd", 'address_line2': "",
+        'city': "Salem", 'state': "TN", 'postal_code': "636001",
+    }
+
+    def setUp(self):
+        self.products = [Product.objects.create(name=f"Thing {i}", price=Decimal('2.50')) for i in range(20)]
+
+    def cart(self, count):
+        return {str(p.id): 3 for p in self.products[:count]}
+
+    def test_price_cart_skips_unknown_products_and_bad_quantities(self):
+        cart = {str(self.products[0].id): 2, '999999': 1, str(self.products[1].id): 0, 'x': 1}
+        items, total = order_service.price_cart(cart)
+        self.assertEqual([it['product'] for it in items], [self.products[0]])
+        self.assertEqual(total, Decimal('5.00'))
+
+    def test_create_order_query_count_only_grows_by_stock_updates(self):
+        with CaptureQueriesContext(connection) as small:
+            order_service.create_order(self.cart(2), self.shipping)
+        with CaptureQueriesContext(connection) as large:
+            order = order_service.create_order(self.cart(11), self.shipping)
+        # Pricing and inserts are constant; each extra line costs one stock UPDATE.
+        # (11 lines: every product's new co-purchase partners still fit, as with 2.)
+        self.assertEqual(len(large) - len(small), 9)
+        self.assertEqual(order.total_amount, Decimal('82.50'))
+        self.assertEqual(order.items.count(), 11)
+        self.assertEqual(order.items.first().product_name, "Thing 0")
+
+    def test_empty_cart_is_rejected(self):
+        with self.assertRaises(order_service.EmptyCartError):
+            order_service.create_order({'999999': 1}, self.shipping)
+        self.assertFalse(Order.objects.exists())
+
+    def test_place_order_view_uses_service(self):
+        fill_cart(self.client, {product: 3 for product in self.products[:2]})
+        response = self.client.post(reverse('place_order'), self.shipping)
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('checkout_success', args=[order.id]))
+        self.assertEqual(order.total_amount, Decimal('15.00'))
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.limited = Product.objects.create(name="Limited", price=Decimal('10.00'), stock=3)
+        self.untracked = Product.objects.create(name="Untracked", price=Decimal('1.00'))
+
+    def test_reservation_decrements_and_ignores_untracked_stock(self):
+        order_service.create_order({str(self.limited.id): 2, str(self.untracked.id): 50}, OrderServiceTests.shipping)
+        self.limited.refresh_from_db()
+        self.untracked.refresh_from_db()
+        self.assertEqual(self.limited.stock, 1)
+        self.assertIsNone(self.untracked.stock)
+
+    def test_failed_line_rolls_back_whole_order(self):
+        other = Product.objects.create(name="Other", price=Decimal('1.00'), stock=5)
+        with self.assertRaises(OutOfStockError):
+            order_service.create_order({str(other.id): 5, str(self.limited.id): 4}, OrderServiceTests.shipping)
+        other.refresh_from_db()
+        self.assertEqual(other.stock, 5)
+        self.assertFalse(Order.objects.exists())
+
+
+@override_settings(BACKGROUND_TASKS='worker')
+class StockContentionTests(TransactionTestCase):
+    """Many buyers racing for one hot product must never oversell it.
+
+    Runs against whatever database is configured (SQLite by default, Postgres
+    when POSTGRES_DB is set).
+    """
+
+    buyers = 16
+    stock = 5
+
+    def test_concurrent_checkouts_never_oversell(self):
+        product = Product.objects.create(name="Hot Item", price=Decimal('99.00'), stock=self.stock)
+        cart = {str(product.id): 1}
+        outcomes = []
+        barrier = threading.Barrier(self.buyers)
+
+        def buy():
+            try:
+                barrier.wait()
+                order_service.create_order(cart, OrderServiceTests.shipping)
+                outcomes.append('ok')
+            except OutOfStockError:
+                outcomes.append('sold out')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buy) for _ in range(self.buyers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(outcomes.count('ok'), self.stock)
+        self.assertEqual(outcomes.count('sold out'), self.buyers - self.stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.shoes = Category.objects.create(name="Shoes")
+        self.hats = Category.objects.create(name="Hats")
+        self.runner = Product.objects.create(name="Runner", price=Decimal('50.00'), category=self.shoes)
+        self.cap = Product.objects.create(name="Cap", price=Decimal('8.00'), category=self.hats)
+
+    def get(self, name, *args):
+        return self.client.get(reverse(name, args=args))
+
+    def test_second_request_is_served_from_cache(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.get('category_detail', self.shoes.slug)
+        with CaptureQueriesContext(connection) as warm:
+            response = self.get('category_detail', self.shoes.slug)
+        self.assertLess(len(warm), len(cold))
+        self.assertContains(response, "Runner")
+        self.assertEqual(catalog_cache.stats()['hits'], 1)
+        self.assertEqual(catalog_cache.stats()['misses'], 1)
+
+    def test_product_change_only_invalidates_its_own_fragments(self):
+        self.get('category_detail', self.shoes.slug)
+        self.get('category_detail', self.hats.slug)
+        self.get('product_detail', self.runner.slug)
+
+        self.runner.price = Decimal('45.00')
+        self.runner.save()
+
+        self.assertContains(self.get('product_detail', self.runner.slug), "45.00")
+        self.assertContains(self.get('category_detail', self.shoes.slug), "45.00")
+        self.get('category_detail', self.hats.slug)
+        self.assertEqual(catalog_cache.stats()['hits'], 1)
+
+    def test_moving_product_refreshes_old_and_new_category(self):
+        self.get('category_detail', self.shoes.slug)
+        self.runner.category = self.hats
+        self.runner.save()
+        self.assertNotContains(self.get('category_detail', self.shoes.slug), "Runner")
+        self.assertContains(self.get('category_detail', self.hats.slug), "Runner")
+        self.assertContains(self.get('products'), "Runner")
+
+    def test_category_rename_refreshes_category_grid(self):
+        self.get('categories')
+        self.hats.name = "Caps & Hats"
+        self.hats.save()
+        self.assertContains(self.get('categories'), "Caps &amp; Hats")
+
+    def test_stats_endpoint_is_superuser_only(self):
+        self.assertEqual(self.get('cache_stats').status_code, 302)
+        self.client.force_login(User.objects.create_superuser('root', 'r@example.com', 'pw'))
+        self.assertEqual(self.get('cache_stats').json()['backend'], 'LocMemCache')
+
+
+class CategoryCountTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.categories = [Category.objects.create(name=f"Aisle {i}") for i in range(5)]
+        for i, category in enumerate(self.categories):
+            for n in range(i):
+                Product.objects.create(name=f"Aisle {i} thing {n}", price=Decimal('1.00'), category=category)
+        Product.objects.create(name="Hidden", price=Decimal('1.00'), category=self.categories[1], available=False)
+        catalog_cache.get_cache().clear()
+
+    def test_counts_come_from_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('categories'))
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, "1 product<")  # Aisle 1: the hidden product isn't counted
+        self.assertContains(response, "4 products")
+
+    def test_tree_is_shared_and_refreshed_by_product_changes(self):
+        self.client.get(reverse('categories'))
+        with self.assertNumQueries(2):  # category lookup + first page; nav reuses the cached tree
+            self.client.get(reverse('products_by_category', args=[self.categories[2].slug]))
+        Product.objects.create(name="New arrival", price=Decimal('1.00'), category=self.categories[0])
+        counts = {c.name: c.product_count for c in catalog_cache.category_tree()}
+        self.assertEqual(counts["Aisle 0"], 1)
+
+    def test_newest_first_listing(self):
+        response = self.client.get(reverse('product_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Aisle 4 thing 3")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.category = Category.objects.create(name="Books")
+        now = timezone.now()
+        # Pairs share a timestamp so the id tie-breaker is exercised.
+        self.products = [
+            Product.objects.create(name=f"Book {i}", price=Decimal('1.00'), category=self.category,
+                                   created_at=now - timedelta(minutes=i // 2))
+            for i in range(11)
+        ]
+        self.expected = sorted(self.products, key=lambda p: (p.created_at, p.id), reverse=True)
+
+    def test_walks_forward_and_back_without_gaps_or_repeats(self):
+        paginator = KeysetPaginator(Product.objects.all(), 4)
+        pages, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            pages.append(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual([p for page in pages for p in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertFalse(pages[0].has_previous)
+
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(back.object_list, pages[1].object_list)
+        self.assertEqual(paginator.get_page(back.previous_cursor).object_list, pages[0].object_list)
+
+    def test_counts_only_when_asked(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(KeysetPaginator(Product.objects.all(), 4).get_page().count)
+        self.assertEqual(KeysetPaginator(Product.objects.all(), 4, count=True).get_page().count, 11)
+
+    def test_bad_cursor_is_rejected_and_view_falls_back_to_first_page(self):
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(Product.objects.all(), 4).get_page("not-a-cursor")
+        url = reverse('products_by_category', args=[self.category.slug])
+        response = self.client.get(url, {'cursor': 'garbage'})
+        self.assertContains(response, "Book 0")
+        self.assertNotContains(response, "?cursor=")  # all 11 fit on one 12-item page
+
+    def test_spellings_of_one_cursor_share_a_cache_entry(self):
+        paginator = KeysetPaginator(Product.objects.all(), 4)
+        cursor = paginator.get_page().next_cursor
+        direction, (created_at, pk) = paginator.decode_cursor(cursor)
+        local = created_at.astimezone(timezone.get_fixed_timezone(330)).isoformat()
+        respelled = base64.urlsafe_b64encode(json.dumps([direction, [local, pk]]).encode()).decode()
+        self.assertNotEqual(respelled, cursor)
+        self.assertEqual(paginator.normalize_cursor(respelled), cursor)
+
+        url = reverse('products_by_category', args=[self.category.slug])
+        self.client.get(url, {'cursor': cursor})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'cursor': respelled})
+        self.assertFalse(any('"E_commerce_product"' in q['sql'] for q in queries.captured_queries))
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertNotIn('FAIL', out.getvalue())
+
+
+class SlugAllocationTests(TestCase):
+    def test_duplicate_names_get_numbered_suffixes(self):
+        Product.objects.create(name="T-Shirt Blue", price=Decimal('1.00'))
+        slugs = [Product.objects.create(name="T-Shirt", price=Decimal('1.00')).slug for _ in range(3)]
+        self.assertEqual(slugs, ['t-shirt', 't-shirt-1', 't-shirt-2'])
+
+    def test_allocation_is_one_query_however_many_collisions(self):
+        for _ in range(10):
+            Product.objects.create(name="Mug", price=Decimal('1.00'))
+        Product.objects.create(name="Mug Cover", price=Decimal('1.00'))
+        Product.objects.create(name="Mug 99 Pack", price=Decimal('1.00'))
+        with self.assertNumQueries(1):
+            self.assertEqual(unique_slug(Product, "Mug"), 'mug-10')
+
+    def test_save_retries_when_slug_is_taken_concurrently(self):
+        Product.objects.create(name="Lamp", price=Decimal('1.00'))
+        # Simulate losing a race: the allocator hands out a slug that's already taken.
+        with mock.patch('E_commerce.models.unique_slug', side_effect=['lamp', 'lamp-1']):
+            product = Product.objects.create(name="Lamp", price=Decimal('1.00'))
+        self.assertEqual(product.slug, 'lamp-1')
+
+    def test_assign_slugs_for_bulk_create(self):
+        Product.objects.create(name="Cap", price=Decimal('1.00'))
+        Product.objects.create(name="Cap", price=Decimal('1.00'))
+        batch = [Product(name=name, price=Decimal('1.00')) for name in ["Cap", "Cap", "Cap 2", "Scarf"]]
+        with self.assertNumQueries(1):
+            assign_slugs(batch)
+        self.assertEqual([p.slug for p in batch], ['cap-2', 'cap-3', 'cap-2-1', 'scarf'])
+        Product.objects.bulk_create(batch)
+
+
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def write(self, name, text):
+        path = f"{self.tmp}/{name}"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_import_upserts_by_slug_and_creates_categories(self):
+        path = self.write('catalog.csv', (
+            "slug,name,category,category_name,price,stock,available,description\n"
+            ",Blue Mug,kitchen,Kitchen,120.00,5,true,Glazed mug\n"
+            "tee,T-Shirt,apparel,,399,,yes,Cotton\n"
+        ))
+        call_command('import_catalog', path, stdout=StringIO())
+        update = self.write('update.jsonl', '{"slug": "tee", "name": "T-Shirt", "category": "apparel", "price": "450"}\n')
+        call_command('import_catalog', update, stdout=StringIO())
+
+        self.assertEqual(Product.objects.count(), 2)
+        mug = Product.objects.get(slug='blue-mug')
+        self.assertEqual((mug.category.name, mug.stock), ("Kitchen", 5))
+        self.assertEqual(Product.objects.get(slug='tee').price, Decimal('450.00'))
+        self.assertEqual([p.slug for p in get_search_backend().search("glazed")[:10]], ['blue-mug'])
+
+    def test_bad_row_reports_its_line(self):
+        path = self.write('bad.csv', "name,price\nLamp,12\nChair,twelve\n")
+        with self.assertRaisesMessage(CommandError, "line 3: bad price 'twelve'"):
+            call_command('import_catalog', path, stdout=StringIO())
+
+    def test_update_keeps_columns_the_row_leaves_out(self):
+        lamp = Product.objects.create(name="Lamp", slug='lamp', price=Decimal('30.00'), stock=7,
+                                      description="Brass desk lamp")
+        call_command('import_catalog', self.write('stock.csv', "slug,name,price\nlamp,Reading Lamp,35\n"),
+                     stdout=StringIO())
+        lamp.refresh_from_db()
+        self.assertEqual((lamp.name, lamp.price, lamp.stock, lamp.description),
+                         ("Reading Lamp", Decimal('35.00'), 7, "Brass desk lamp"))
+        self.assertEqual([p.slug for p in get_search_backend().search("brass reading")[:10]], ['lamp'])
+
+    def test_bad_json_line_reports_its_line(self):
+        path = self.write('bad.jsonl', '{"name": "Lamp", "price": "12"}\n\n{"name": "Chair", \n')
+        with self.assertRaisesMessage(CommandError, "line 3: invalid JSON"):
+            call_command('import_catalog', path, stdout=StringIO())
+
+    def test_export_round_trips(self):
+        category = Category.objects.create(name="Books")
+        Product.objects.create(name="Atlas", category=category, price=Decimal('15.50'), stock=3)
+        path = f"{self.tmp}/export.jsonl"
+        call_command('export_catalog', path, stdout=StringIO())
+        Product.objects.all().delete()
+        call_command('import_catalog', path, stdout=StringIO())
+        atlas = Product.objects.get(slug='atlas')
+        self.assertEqual((atlas.category, atlas.price, atlas.stock), (category, Decimal('15.50'), 3))
+
+    def test_signals_suspended_skips_receivers(self):
+        with signals_suspended():
+            user = User.objects.create_user('quiet')
+            Product.objects.create(name="Unindexed Widget", price=Decimal('1.00'))
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+        self.assertEqual(get_search_backend().search("unindexed").count(), 0)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Kettle", price=Decimal('40.00'))
+        self.old = create_order([self.product], total_amount=Decimal('80.00'))
+        Order.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=30))
+        self.recent = create_order([self.product, self.product], total_amount=Decimal('160.00'))
+        self.empty = create_order([], total_amount=Decimal('0.00'))
+        staff = User.objects.create_user('clerk', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.url = reverse('export_orders')
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_item(self):
+        rows = self.export().splitlines()
+        self.assertTrue(rows[0].startswith('order_id,created_at'))
+        order_ids = [int(row.split(',')[0]) for row in rows[1:]]
+        self.assertEqual(order_ids, [self.old.pk, self.recent.pk, self.recent.pk, self.empty.pk])
+
+    def test_csv_defuses_formula_cells(self):
+        Order.objects.filter(pk=self.empty.pk).update(full_name='=HYPERLINK("http://x")', city="@SUM(A1)")
+        row = next(csv.reader(self.export().splitlines()[-1:]))
+        self.assertEqual(row[CSV_HEADER.index('full_name')], '\'=HYPERLINK("http://x")')
+        self.assertEqual(row[CSV_HEADER.index('city')], "'@SUM(A1)")
+        self.assertEqual(row[CSV_HEADER.index('total_amount')], '0.00')
+
+    def test_jsonl_nests_items_and_filters_by_date(self):
+        start = (timezone.localdate() - timedelta(days=1)).isoformat()
+        orders = [json.loads(line) for line in self.export(format='jsonl', start=start).splitlines()]
+        self.assertEqual([o['id'] for o in orders], [self.recent.pk, self.empty.pk])
+        self.assertEqual([item['product_name'] for item in orders[0]['items']], ["Kettle", "Kettle"])
+        self.assertEqual(orders[1]['items'], [])
+
+    def test_bad_parameters_and_non_staff(self):
+        self.assertEqual(self.client.get(self.url, {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 400)
+        self.client.force_login(User.objects.create_user('shopper'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class SalesRollupTests(TestCase):
+    shipping = OrderServiceTests.shipping
+
+    def setUp(self):
+        self.books = Category.objects.create(name="Books")
+        self.atlas = Product.objects.create(name="Atlas", category=self.books, price=Decimal('10.00'))
+        self.pen = Product.objects.create(name="Pen", price=Decimal('2.50'))
+
+    def test_checkout_increments_rollups(self):
+        order_service.create_order({str(self.atlas.id): 2, str(self.pen.id): 4}, self.shipping)
+        order_service.create_order({str(self.atlas.id): 1}, self.shipping)
+
+        day = DailySales.objects.get()
+        self.assertEqual((day.revenue, day.units, day.orders), (Decimal('40.00'), 7, 2))
+        atlas = DailyProductSales.objects.get(product=self.atlas)
+        self.assertEqual((atlas.revenue, atlas.units, atlas.orders), (Decimal('30.00'), 3, 2))
+        books = DailyCategorySales.objects.get()
+        self.assertEqual((books.category, books.revenue, books.orders), (self.books, Decimal('30.00'), 2))
+
+    def test_reconcile_repairs_drift(self):
+        order_service.create_order({str(self.atlas.id): 2}, self.shipping)
+        create_order([self.pen])  # written directly, so the rollups never saw it
+        DailyProductSales.objects.filter(product=self.atlas).update(units=99)
+
+        out = StringIO()
+        call_command('reconcile_sales', stdout=out)
+        self.assertIn("DailySales: 1 rows fixed", out.getvalue())
+        self.assertIn("DailyProductSales: 2 rows fixed", out.getvalue())
+        self.assertEqual(DailyProductSales.objects.get(product=self.atlas).units, 2)
+        self.assertEqual(DailySales.objects.get().revenue, Decimal('25.00'))
+        self.assertEqual(sales.reconcile(timezone.localdate(), timezone.localdate()),
+                         {'DailySales': 0, 'DailyProductSales': 0, 'DailyCategorySales': 0})
+
+    def test_dashboard_reads_rollups(self):
+        order_service.create_order({str(self.atlas.id): 2}, self.shipping)
+        self.client.force_login(User.objects.create_superuser('boss', password='pw'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin_dashboard'))
+        # Daily totals, top products, top categories: no OrderItem scan.
+        rollup_queries = [q['sql'] for q in queries if 'daily' in q['sql']]
+        self.assertEqual(len(rollup_queries), 3)
+        self.assertFalse(any('orderitem' in sql for sql in rollup_queries))
+        self.assertContains(response, "Atlas — ₹20")
+        self.assertEqual(len(response.context['sales']['daily']), 30)
+
+
+class AdminDashboardTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('boss', password='pw'))
+        self.url = reverse('admin_dashboard')
+        self.kitchen = Category.objects.create(name="Kitchen")
+        self.garden = Category.objects.create(name="Garden")
+
+    def add_products(self, count, category, price='10.00', **fields):
+        Product.objects.bulk_create([
+            Product(name=f"{category.name} item {i}", slug=f"{category.slug}-{i}", category=category,
+                    price=Decimal(price), **fields)
+            for i in range(count)
+        ])
+
+    def test_query_count_does_not_grow_with_catalog(self):
+        self.add_products(3, self.kitchen)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url)
+        self.add_products(60, self.garden)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(len(response.context['products']), 25)
+
+    def test_filters_and_sorting(self):
+        self.add_products(3, self.kitchen, price='5.00')
+        self.add_products(2, self.garden, price='50.00', available=False)
+        response = self.client.get(self.url, {'category': self.garden.pk, 'available': 'no', 'min_price': '20'})
+        self.assertEqual({p.name for p in response.context['products']}, {"Garden item 0", "Garden item 1"})
+
+        response = self.client.get(self.url, {'q': 'kitchen item', 'sort': '-name'})
+        self.assertEqual([p.name for p in response.context['products']],
+                         ["Kitchen item 2", "Kitchen item 1", "Kitchen item 0"])
+
+        response = self.client.get(self.url, {'min_price': 'cheap'})  # ignored, not a crash
+        self.assertEqual(len(response.context['products']), 5)
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        self.mug = Product.objects.create(name="Mug", price=Decimal('4.00'))
+        self.jug = Product.objects.create(name="Jug", price=Decimal('9.00'))
+
+    def writes(self, queries):
+        return [q['sql'] for q in queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+
+    def test_add_to_cart_writes_no_sql_with_cookie_or_cache_storage(self):
+        for storage in ('cookie', 'cache'):
+            with self.subTest(storage=storage), override_settings(CART_STORAGE=storage):
+                self.client.cookies.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.post(reverse('add_to_cart', args=[self.mug.slug]))
+                    self.client.post(reverse('add_to_cart', args=[self.mug.slug]))
+                self.assertEqual(self.writes(queries), [])
+                items = self.client.get(reverse('cart')).context['items']
+                self.assertEqual([(it['product'], it['quantity']) for it in items], [(self.mug, 2)])
+
+    @override_settings(CART_STORAGE='session')
+    def test_session_storage_keeps_the_old_session_format(self):
+        fill_cart(self.client, {self.mug: 3})
+        self.assertEqual(self.client.session['cart'], {str(self.mug.id): 3})
+
+    def test_update_and_remove(self):
+        fill_cart(self.client, {self.mug: 1, self.jug: 1})
+        self.client.post(reverse('update_cart'), {'product_id': self.jug.id, 'action': 'update', 'quantity': 0})
+        self.client.post(reverse('update_cart'), {'product_id': self.mug.id, 'action': 'remove'})
+        response = self.client.get(reverse('orders'))
+        self.assertEqual([(it['product'], it['quantity']) for it in response.context['items']], [(self.jug, 1)])
+        self.assertEqual(response.context['total'], Decimal('9.00'))
+
+    @override_settings(CART_STORAGE='cookie', CART_USER_STORAGE='session')
+    def test_anonymous_cart_is_merged_on_login(self):
+        User.objects.create_user('shopper', password='s3cret-pass')
+        fill_cart(self.client, {self.mug: 2})
+        self.client.post(reverse('login'), {'username': 'shopper', 'password': 's3cret-pass'})
+        self.assertEqual(self.client.session['cart'], {str(self.mug.id): 2})
+        self.assertEqual(self.client.cookies['cart'].value, '')
+
+
+@override_settings(CART_STORAGE='cookie', CART_USER_STORAGE='db')
+class SavedCartTests(TestCase):
+    def setUp(self):
+        self.products = [Product.objects.create(name=f"Item {i}", price=Decimal('3.00')) for i in range(20)]
+        self.user = User.objects.create_user('saver', password='s3cret-pass')
+
+    def test_cart_follows_the_user_across_devices(self):
+        self.client.force_login(self.user)
+        fill_cart(self.client, {self.products[0]: 2})
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+        laptop = Client()
+        laptop.force_login(self.user)
+        items = laptop.get(reverse('orders')).context['items']
+        self.assertEqual([(it['product'], it['quantity']) for it in items], [(self.products[0], 2)])
+
+    def test_cart_page_is_one_query_whatever_its_size(self):
+        self.client.force_login(self.user)
+        fill_cart(self.client, {self.products[0]: 1})
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('orders'))
+        fill_cart(self.client, {p: 1 for p in self.products[1:]})
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('orders'))
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(len([q for q in large if 'cartitem' in q['sql']]), 1)
+        self.assertEqual(response.context['total'], Decimal('60.00'))
+
+    def test_login_merges_anonymous_cart_into_saved_cart(self):
+        saved = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=saved, product=self.products[0], quantity=1, unit_price=Decimal('3.00'))
+        fill_cart(self.client, {self.products[0]: 2, self.products[1]: 1})
+        self.client.post(reverse('login'), {'username': 'saver', 'password': 's3cret-pass'})
+
+        lines = dict(CartItem.objects.values_list('product_id', 'quantity'))
+        self.assertEqual(lines, {self.products[0].id: 3, self.products[1].id: 1})
+        self.assertEqual(self.client.cookies['cart'].value, '')
+
+    def test_price_changes_are_flagged_and_checkout_empties_the_cart(self):
+        self.client.force_login(self.user)
+        fill_cart(self.client, {self.products[0]: 1})
+        Product.objects.filter(pk=self.products[0].pk).update(price=Decimal('4.00'))
+        self.assertContains(self.client.get(reverse('orders')), "was ₹3.00 when added")
+
+        self.client.post(reverse('place_order'), OrderServiceTests.shipping)
+        self.assertEqual(Order.objects.get().total_amount, Decimal('4.00'))
+        self.assertFalse(CartItem.objects.exists())
+
+
+class CartApiTests(TestCase):
+    def setUp(self):
+        self.mug = Product.objects.create(name="Mug", price=Decimal('4.00'))
+        self.jug = Product.objects.create(name="Jug", price=Decimal('9.50'))
+
+    def call(self, name, **payload):
+        return self.client.post(reverse(name), json.dumps(payload), content_type='application/json')
+
+    def test_add_update_remove_return_the_line_and_totals(self):
+        body = self.call('cart_api_add', product_id=self.mug.id, quantity=2).json()
+        self.assertEqual(body['line'], {'product_id': self.mug.id, 'name': "Mug", 'quantity': 2,
+                                        'price': "4.00", 'subtotal': "8.00"})
+        self.call('cart_api_add', product_id=self.jug.id)
+
+        body = self.call('cart_api_update', product_id=self.mug.id, quantity=5).json()
+        self.assertEqual((body['line']['subtotal'], body['cart']), ("20.00", {'lines': 2, 'count': 6, 'total': "29.50"}))
+
+        body = self.call('cart_api_remove', product_id=self.mug.id).json()
+        self.assertEqual((body['line'], body['cart']['total']), (None, "9.50"))
+
+        summary = self.client.get(reverse('cart_api')).json()
+        self.assertEqual([line['name'] for line in summary['cart']['items']], ["Jug"])
+
+    def test_form_encoded_requests_work_too(self):
+        response = self.client.post(reverse('cart_api_add'), {'product_id': self.mug.id})
+        self.assertEqual(response.json()['cart']['count'], 1)
+
+    def test_errors(self):
+        self.assertEqual(self.call('cart_api_add', product_id=999999).status_code, 404)
+        self.assertEqual(self.call('cart_api_add', product_id="mug").status_code, 400)
+        self.assertEqual(self.call('cart_api_update', product_id=self.mug.id, quantity=2).status_code, 404)
+        bad_json = self.client.post(reverse('cart_api_add'), "{", content_type='application/json')
+        self.assertEqual(bad_json.status_code, 400)
+        self.assertEqual(self.client.get(reverse('cart_api_add')).status_code, 405)
+
+    def test_api_answers_in_one_request(self):
+        fill_cart(self.client, {self.mug: 1})
+        response = self.client.post(reverse('update_cart'), {'product_id': self.mug.id, 'action': 'update',
+                                                              'quantity': 3}, follow=True)
+        self.assertEqual(len(response.redirect_chain), 1)  # form: POST, redirect, full page render
+        with self.assertNumQueries(1):  # API: one request, pricing the cart is the only query
+            response = self.call('cart_api_update', product_id=self.mug.id, quantity=4)
+        self.assertEqual(response.json()['line']['quantity'], 4)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, BACKGROUND_TASKS='sync')
+class ThumbnailTests(TestCase):
+    def upload(self, name, size):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 40, 40)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_builds_srcsets_without_upscaling(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Red Kettle", price=Decimal('30.00'),
+                                             image=self.upload('kettle.png', (500, 250)))
+        product.refresh_from_db()
+        thumbs = product.thumbnails
+        self.assertEqual(thumbs['source'], product.image.name)
+        self.assertEqual([entry.rsplit(' ', 1)[1] for entry in thumbs['webp'].split(', ')],
+                         ['200w', '400w', '500w'])
+        storage = product.image.storage
+        for entry in thumbs['jpeg'].split(', '):
+            url = entry.rsplit(' ', 1)[0]
+            self.assertTrue(storage.exists(url.removeprefix(settings.MEDIA_URL)))
+
+        html = self.client.get(reverse('product_detail', args=[product.slug])).content.decode()
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(thumbs['webp'], html)
+
+    @override_settings(BACKGROUND_TASKS='worker')
+    def test_command_backfills_missing_thumbnails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Blue Kettle", price=Decimal('30.00'),
+                                             image=self.upload('blue.png', (900, 900)))
+        product.refresh_from_db()
+        self.assertEqual(product.thumbnails, {})
+        html = self.client.get(reverse('product_detail', args=[product.slug])).content.decode()
+        self.assertIn(product.image.url, html)
+
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn("products: 1 thumbnailed", out.getvalue())
+        product.refresh_from_db()
+        self.assertIn('800w', product.thumbnails['webp'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, BACKGROUND_TASKS='sync')
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        perf.stats.reset()
+        self.product = Product.objects.create(name="Steel Flask", price=Decimal('12.00'))
+
+    def timing(self, response):
+        spans = {}
+        for part in response['Server-Timing'].split(', '):
+            name, *params = part.split(';')
+            spans[name] = dict(param.split('=', 1) for param in params)
+        return spans
+
+    def test_server_timing_reports_queries_and_template_time(self):
+        self.client.force_login(User.objects.create_user('ops', is_staff=True))
+        url = reverse('product_detail', args=[self.product.slug])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        spans = self.timing(response)
+        self.assertEqual(spans['db']['desc'], f'"{len(queries)} queries"')
+        self.assertIn('tpl', spans)
+        self.assertGreaterEqual(float(spans['total']['dur']), float(spans['tpl']['dur']))
+
+    def test_server_timing_is_not_sent_to_customers(self):
+        url = reverse('product_detail', args=[self.product.slug])
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        self.client.force_login(User.objects.create_user('shopper'))
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        with override_settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get(url))
+
+    def test_deciding_on_the_header_never_loads_the_user(self):
+        request = RequestFactory().get('/')
+        request.user = SimpleLazyObject(lambda: self.fail("the middleware resolved request.user"))
+        response = PerformanceMiddleware(lambda request: HttpResponse())(request)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_invoice_render_time_is_logged_by_the_worker(self):
+        order = create_order([self.product], invoice_status=Order.InvoiceStatus.PENDING)
+        with self.assertLogs('E_commerce.utils.invoice_queue', 'INFO') as logs:
+            self.assertTrue(render_invoice(order.id))
+        self.assertRegex(logs.output[0], rf"Rendered invoice for order {order.id} in [\d.]+ms")
+
+    @override_settings(PERF_SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_the_view_name(self):
+        with self.assertLogs('E_commerce.utils.perf', 'WARNING') as logs:
+            self.client.get(reverse('product_detail', args=[self.product.slug]))
+        self.assertIn("in product_detail:", logs.output[0])
+
+    def test_stats_endpoint_is_staff_only_and_aggregates_per_view(self):
+        for _ in range(3):
+            self.client.get(reverse('product_detail', args=[self.product.slug]))
+        self.assertEqual(self.client.get(reverse('perf_stats')).status_code, 302)
+
+        staff = User.objects.create_user('ops', password='pw-12345', is_staff=True)
+        self.client.force_login(staff)
+        stats = self.client.get(reverse('perf_stats')).json()
+        detail = stats['product_detail']
+        self.assertEqual(detail['count'], 3)
+        self.assertEqual(sum(detail['histogram'].values()), 3)
+        self.assertGreater(detail['queries_per_request'], 0)
+        self.assertIn('tpl', detail['spans_ms_mean'])
+
+
+class BenchStorefrontTests(TransactionTestCase):
+    # Transactional, so the invoices it queues are rendered on commit as they would be live.
+    def test_smoke_run_reports_every_flow_as_json(self):
+        # The flush after the test doesn't reach the search index; drop what the run indexed.
+        self.addCleanup(lambda: get_search_backend().remove(Product.objects.values_list('id', flat=True)))
+        out = StringIO()
+        call_command('bench_storefront', '--current-database', '--products=30', '--requests=2', '--warmup=1',
+                     '--pages=2', '--json', '-', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['flows']), set(Flows.names))
+        listing = report['flows']['product_list']
+        self.assertEqual(listing['requests'], 2)
+        self.assertEqual(listing['cache_hits'] + listing['cache_misses'], 4)  # grid and nav per request
+
+
+class GenerateDataTests(TestCase):
+    def generate(self, **options):
+        args = [f'--{name}={value}' for name, value in options.items()]
+        call_command('generate_data', *args, '--batch-size=7', stdout=StringIO())
+
+    def test_generates_linked_rows_and_matching_rollups(self):
+        self.generate(categories=3, products=40, users=5, orders=30, seed=4)
+        self.assertEqual(Category.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(Profile.objects.filter(user__username__startswith='user').count(), 5)
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertFalse(Product.objects.filter(category__isnull=True).exists())
+        word = Product.objects.first().name.split()[-1]
+        self.assertGreater(get_search_backend().search(word).count(), 0)
+
+        for order in Order.objects.with_items():
+            items = list(order.items.all())
+            self.assertTrue(1 <= len(items) <= 5)
+            self.assertEqual(order.total_amount, sum(it.subtotal for it in items))
+        today = timezone.localdate()
+        drift = sales.reconcile(today - timedelta(days=365), today, dry_run=True)
+        self.assertEqual(set(drift.values()), {0})
+        self.assertTrue(User.objects.filter(username__startswith='user').first().check_password('password'))
+
+    def test_users_skip_taken_usernames(self):
+        squatter = User.objects.create_user('squatter')
+        n = squatter.id + 1  # generated users are numbered from the next id
+        User.objects.filter(pk=squatter.pk).update(username=f'user{n}')
+        self.generate(categories=0, products=0, users=3, orders=0)
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)),
+                         sorted(f'user{i}' for i in range(n, n + 4)))
+
+    def test_same_seed_gives_same_data(self):
+        self.generate(categories=2, products=20, users=0, orders=0, seed=9)
+        first = list(Product.objects.order_by('id').values_list('name', 'price'))
+        Category.objects.all().delete()
+        Product.objects.all().delete()
+        self.generate(categories=2, products=20, users=0, orders=0, seed=9)
+        self.assertEqual(list(Product.objects.order_by('id').values_list('name', 'price')), first)
+
+
+class RecommendationTests(TestCase):
+    shipping = {'full_name': "Asha", 'phone': "9876543210", 'address_line1': "2 Lake Rd",
+                'address_line2': "", 'city': "Madurai", 'state': "TN", 'postal_code': "625001"}
+
+    def setUp(self):
+        self.tent, self.stove, self.lamp, self.mat = (
+            Product.objects.create(name=name, price=Decimal('10.00')) for name in ("Tent", "Stove", "Lamp", "Mat")
+        )
+
+    def buy(self, *products):
+        return order_service.create_order({str(p.id): 1 for p in products}, self.shipping)
+
+    def neighbours(self, product):
+        return list(CoPurchase.objects.filter(product=product).order_by('-count', 'other_id')
+                    .values_list('other__name', 'count'))
+
+    def test_rebuild_counts_orders_not_lines_and_keeps_top_k(self):
+        for _ in range(3):
+            self.buy(self.tent, self.stove)
+        self.buy(self.tent, self.lamp, self.mat)
+        order = create_order([self.tent, self.mat])
+        OrderItem.objects.create(order=order, product=self.mat, quantity=1, price=1, subtotal=1)
+        CoPurchase.objects.all().delete()
+
+        self.assertEqual(recommendations.rebuild(k=2), 7)
+        self.assertEqual(self.neighbours(self.tent), [("Stove", 3), ("Mat", 2)])
+        self.assertEqual(self.neighbours(self.lamp), [("Tent", 1), ("Mat", 1)])
+
+    def test_checkouts_update_counts_incrementally(self):
+        self.buy(self.tent, self.stove)
+        self.buy(self.stove, self.tent, self.lamp)
+        self.buy(self.lamp)
+        self.assertEqual(self.neighbours(self.stove), [("Tent", 2), ("Lamp", 1)])
+        recommendations.rebuild()
+        self.assertEqual(self.neighbours(self.stove), [("Tent", 2), ("Lamp", 1)])
+
+    def test_checkout_only_adds_partners_that_all_fit(self):
+        recommendations.bump_pairs([self.tent.id, self.stove.id], k=2)
+        recommendations.bump_pairs([self.tent.id, self.stove.id, self.lamp.id, self.mat.id], k=2)
+        self.assertEqual(self.neighbours(self.tent), [("Stove", 2)])
+        self.assertEqual(self.neighbours(self.lamp), [])  # three new partners, two slots: left to the rebuild
+        recommendations.bump_pairs([self.lamp.id, self.mat.id], k=2)
+        self.assertEqual(self.neighbours(self.lamp), [("Mat", 1)])
+        self.assertEqual(CoPurchase.objects.count(), 4)
+
+    def test_detail_page_shows_available_partners(self):
+        self.buy(self.tent, self.stove, self.lamp)
+        self.buy(self.tent, self.stove)
+        Product.objects.filter(pk=self.lamp.pk).update(available=False)
+        response = self.client.get(reverse('product_detail', args=[self.tent.slug]))
+        self.assertEqual(response.context['recommendations'], [self.stove])
+        self.assertContains(response, "Frequently bought together")
+
+
+@override_settings(BACKGROUND_TASKS='sync')
+class SimilarProductTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        path_override = override_settings(SIMILARITY_MODEL_PATH=f"{tmp}/similarity.npz")
+        path_override.enable()
+        self.addCleanup(path_override.disable)
+        texts = [
+            ("Red Cotton Shirt", "Soft cotton shirt with long sleeves"),
+            ("Blue Cotton Shirt", "Cotton shirt, short sleeves"),
+            ("Steel Water Bottle", "Insulated steel bottle keeps water cold"),
+            ("Insulated Bottle", "Double wall steel, one litre"),
+            ("Desk Lamp", "LED lamp for reading"),
+        ]
+        with signals_suspended():
+            self.shirt, self.blue, self.bottle, self.flask, self.lamp = (
+                Product.objects.create(name=name, description=text, price=Decimal('9.00')) for name, text in texts
+            )
+
+    def neighbours(self, product):
+        return list(SimilarProduct.objects.filter(product=product).order_by('-score', 'other_id')
+                    .values_list('other__name', flat=True))
+
+    def test_blocked_top_k_matches_brute_force(self):
+        vectors = similarity.catalog_vectors().vectors
+        dense = (vectors @ vectors.T).toarray()
+        for row, columns, scores in similarity.top_k_blocked(vectors, k=2, block_cells=7):
+            expected = [col for col in np.argsort(-dense[row], kind='stable') if col != row and dense[row, col] > 0][:2]
+            self.assertEqual(list(columns), expected)
+            self.assertTrue(np.allclose(scores, dense[row, expected]))
+            self.assertTrue(all(0 < score <= 1.0001 for score in scores))
+
+    def test_rebuild_stores_nearest_neighbours(self):
+        call_command('build_similar_products', '--top=2', stdout=StringIO())
+        self.assertEqual(self.neighbours(self.shirt), ["Blue Cotton Shirt"])
+        self.assertEqual(self.neighbours(self.bottle), ["Insulated Bottle"])
+        self.assertEqual(self.neighbours(self.lamp), [])
+
+    def test_saving_new_text_refreshes_incrementally(self):
+        similarity.rebuild(k=2)
+        admin = User.objects.create_superuser('boss', password='pw-12345')
+        self.client.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('add_product'), {
+                'name': "Green Cotton Shirt", 'price': '12.00', 'available': 'on',
+                'description': "Cotton shirt in green",
+            })
+        green = Product.objects.get(name="Green Cotton Shirt")
+        self.assertEqual(set(self.neighbours(green)), {"Red Cotton Shirt", "Blue Cotton Shirt"})
+        self.assertIn("Green Cotton Shirt", self.neighbours(self.shirt))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('edit_product', args=[green.pk]), {
+                'name': "Green Desk Lamp", 'price': '12.00', 'available': 'on', 'description': "LED lamp",
+            })
+        self.assertEqual(self.neighbours(green), ["Desk Lamp"])
+        self.assertNotIn("Green Desk Lamp", self.neighbours(self.shirt))
+        self.assertIn("Green Desk Lamp", self.neighbours(self.lamp))
+
+        # A save that doesn't touch the text queues nothing.
+        with self.captureOnCommitCallbacks() as callbacks:
+            Product.objects.filter(pk=green.pk).first().save()
+        self.assertEqual(callbacks, [])
+
+    def test_refresh_scores_against_the_saved_model(self):
+        similarity.rebuild(k=2)
+        Product.objects.filter(pk=self.lamp.pk).update(name="Cotton Shirt Lamp")
+        with mock.patch.object(similarity, 'catalog_vectors', side_effect=AssertionError("full rebuild")):
+            self.assertTrue(similarity.refresh_similar(self.lamp.pk, k=2))
+        self.assertEqual(set(self.neighbours(self.lamp)), {"Red Cotton Shirt", "Blue Cotton Shirt"})
+
+    def test_repeated_saves_queue_one_refresh(self):
+        with mock.patch.object(similarity, 'run_in_background') as run:
+            for _ in range(3):
+                similarity.queue_refresh(self.lamp.pk)
+            self.assertEqual(run.call_count, 1)
+            similarity._refresh_pending(self.lamp.pk)  # the queued run starts
+            similarity.queue_refresh(self.lamp.pk)
+            self.assertEqual(run.call_count, 2)
+        similarity._pending.discard(self.lamp.pk)
+
+    def test_detail_page_lists_similar_products(self):
+        similarity.rebuild()
+        response = self.client.get(reverse('product_detail', args=[self.bottle.slug]))
+        self.assertEqual(response.context['similar'], [self.flask])
+        self.assertContains(response, "Similar products")
@@ -4,11 +4,16 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('products/', views.products, name='products'),
+    path('products/new/', views.product_list, name='product_list'),
     path('categories/', views.categories_list, name='categories'),
     path('category/<slug:slug>/', views.category_detail, name='category_detail'),
     path('cart/add/<slug:slug>/', views.add_to_cart, name='add_to_cart'),
     path('cart/', views.cart_view, name='cart'),
     path('cart/update/', views.update_cart, name='update_cart'),
+    path('api/cart/', views.cart_api, name='cart_api'),
+    path('api/cart/add/', views.cart_api_add, name='cart_api_add'),
+    path('api/cart/update/', views.cart_api_update, name='cart_api_update'),
+    path('api/cart/remove/', views.cart_api_remove, name='cart_api_remove'),
     path('product/<slug:slug>/', views.product_detail, name='product_detail'),
     path('products/category/<slug:category_slug>/', views.product_list_by_category, name='products_by_category'),
     path('orders/', views.orders, name='orders'),
@@ -29,4 +34,7 @@ urlpatterns = [
     path('admin-dashboard/add/', views.add_product, name='add_product'),
     path('admin-dashboard/edit/<int:pk>/', views.edit_product, name='edit_product'),
     path('admin-dashboard/delete/<int:pk>/', views.delete_product, name='delete_product'),
+    path('admin-dashboard/cache-stats/', views.cache_stats, name='cache_stats'),
+    path('admin-dashboard/perf-stats/', views.perf_stats, name='perf_stats'),
+    path('admin-dashboard/orders/export/', views.export_orders, name='export_orders'),
 ]
@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+WORDS = (
+    "cotton shirt denim jacket leather wallet steel bottle wireless mouse "
+    "mechanical keyboard running shoes yoga mat ceramic mug desk lamp "
+    "bluetooth speaker travel backpack silk scarf wool sweater analog watch "
+    "phone case laptop sleeve kitchen knife coffee grinder water filter"
+).split()
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """Run the block against a throwaway test database, never the real one."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def seed_products(count, start=0, batch_size=5000, seed=0):
+    """Bulk insert ``count`` synthetic products, bypassing save() and signals."""
+    from ..models import Product
+    rng = random.Random(seed + start)
+    epoch = timezone.now() - timedelta(days=365)
+    for offset in range(start, start + count, batch_size):
+        batch = []
+        for i in range(offset, min(offset + batch_size, start + count)):
+            name = " ".join(rng.sample(WORDS, 3)).title()
+            batch.append(Product(
+                name=name,
+                slug=f"bench-product-{i}",
+                price=Decimal(rng.randint(100, 99999)) / 100,
+                description=" ".join(rng.choices(WORDS, k=20)),
+                created_at=epoch + timedelta(seconds=i * 7),
+            ))
+        Product.objects.bulk_create(batch)
+
+
+def seed_orders(count, items_per_order=5, batch_size=1000, seed=0):
+    """Bulk insert ``count`` orders spread over the existing products."""
+    from ..models import Order, OrderItem, Product
+    rng = random.Random(seed)
+    products = list(Product.objects.values_list('id', 'name', 'slug', 'price'))
+    for offset in range(0, count, batch_size):
+        orders = Order.objects.bulk_create([
+            Order(full_name=f"Customer {i}", phone=f"98{i:08d}"[:10], address_line1=f"{i} Market Road",
+                  city=rng.choice(("Chennai", "Mumbai", "Pune", "Delhi")), state="IN", postal_code="600001")
+            for i in range(offset, min(offset + batch_size, count))
+        ])
+        items = []
+        for order in orders:
+            total = Decimal('0.00')
+            for product_id, name, slug, price in rng.sample(products, min(items_per_order, len(products))):
+                quantity = rng.randint(1, 3)
+                items.append(OrderItem(order=order, product_id=product_id, product_name=name, product_slug=slug,
+                                       quantity=quantity, price=price, subtotal=price * quantity))
+                total += price * quantity
+            order.total_amount = total
+        OrderItem.objects.bulk_create(items)
+        Order.objects.bulk_update(orders, ['total_amount'])
+
+
+def measure(fn, repeat=20):
+    """Call ``fn`` ``repeat`` times and return the wall-clock samples in ms."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'p50': statistics.median(samples),
+        'p95': percentile(samples, 95),
+        'mean': statistics.fmean(samples),
+    }
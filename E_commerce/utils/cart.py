@@ -0,0 +1,274 @@
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ..models import Cart as SavedCart, CartItem, Product
+from .orders import price_cart
+
+STORAGES = {
+    'cookie': 'E_commerce.utils.cart.SignedCookieCartStorage',
+    'cache': 'E_commerce.utils.cart.CacheCartStorage',
+    'session': 'E_commerce.utils.cart.SessionCartStorage',
+    'db': 'E_commerce.utils.cart.DatabaseCartStorage',
+}
+COOKIE_NAME = 'cart'
+CART_ID_COOKIE = 'cart_id'
+COOKIE_SALT = 'E_commerce.cart'
+MAX_AGE = 60 * 60 * 24 * 30
+
+
+def _cookie_kwargs():
+    return {'max_age': MAX_AGE, 'httponly': True, 'samesite': 'Lax', 'secure': settings.SESSION_COOKIE_SECURE}
+
+
+class CartStorage:
+    """Where a cart's ``{product id: quantity}`` lines live between requests."""
+
+    def __init__(self, request):
+        self.request = request
+
+    def load(self):
+        raise NotImplementedError
+
+    def save(self, lines, response):
+        raise NotImplementedError
+
+    def clear(self, response):
+        raise NotImplementedError
+
+
+class SessionCartStorage(CartStorage):
+    """The original session cart. Only SQL-free with a cache session engine."""
+
+    def load(self):
+        return {int(pid): qty for pid, qty in self.request.session.get('cart', {}).items()}
+
+    def save(self, lines, response):
+        self.request.session['cart'] = {str(pid): qty for pid, qty in lines.items()}
+
+    def clear(self, response):
+        self.request.session.pop('cart', None)
+
+
+class SignedCookieCartStorage(CartStorage):
+    """The whole cart in a signed cookie (``"12:2,7:1"``): no server state at all.
+
+    Signing stops tampering with the ids, not reading them; prices are
+    always looked up server-side. A cookie tops out around 4KB, a few
+    hundred lines.
+    """
+
+    def load(self):
+        value = self.request.get_signed_cookie(COOKIE_NAME, default='', salt=COOKIE_SALT, max_age=MAX_AGE)
+        lines = {}
+        for pair in filter(None, value.split(',')):
+            try:
+                pid, qty = map(int, pair.split(':'))
+            except ValueError:
+                continue
+            lines[pid] = qty
+        return lines
+
+    def save(self, lines, response):
+        value = ','.join(f'{pid}:{qty}' for pid, qty in lines.items())
+        response.set_signed_cookie(COOKIE_NAME, value, salt=COOKIE_SALT, **_cookie_kwargs())
+
+    def clear(self, response):
+        response.delete_cookie(COOKIE_NAME)
+
+
+class CacheCartStorage(CartStorage):
+    """Lines in the cache under a random id kept in a signed cookie."""
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.cache = caches[getattr(settings, 'CART_CACHE_ALIAS', 'default')]
+        self.cart_id = request.get_signed_cookie(CART_ID_COOKIE, default=None, salt=COOKIE_SALT, max_age=MAX_AGE)
+
+    def key(self):
+        return f'cart:{self.cart_id}'
+
+    def load(self):
+        if not self.cart_id:
+            return {}
+        return self.cache.get(self.key(), {})
+
+    def save(self, lines, response):
+        if not self.cart_id:
+            self.cart_id = uuid.uuid4().hex
+        self.cache.set(self.key(), dict(lines), MAX_AGE)
+        response.set_signed_cookie(CART_ID_COOKIE, self.cart_id, salt=COOKIE_SALT, **_cookie_kwargs())
+
+    def clear(self, response):
+        if self.cart_id:
+            self.cache.delete(self.key())
+        response.delete_cookie(CART_ID_COOKIE)
+
+
+class DatabaseCartStorage(CartStorage):
+    """Signed-in users' carts in Cart/CartItem, so they follow the user across
+    devices and outlive the session.
+
+    ``load`` is one query that also brings the products, which ``priced``
+    reuses, so showing the cart never re-queries the catalog. ``save`` only
+    writes the lines that changed.
+    """
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.user_id = request.user.pk
+        self.rows = {}
+
+    def load(self):
+        items = CartItem.objects.filter(cart_id=self.user_id).select_related('product').order_by('id')
+        self.rows = {item.product_id: item for item in items}
+        return {pid: item.quantity for pid, item in self.rows.items()}
+
+    def priced(self, lines):
+        if lines.keys() - self.rows.keys():
+            return None  # lines added since loading; let the caller price them
+        items = []
+        total = Decimal('0.00')
+        for pid, quantity in lines.items():
+            if quantity <= 0:
+                continue
+            product = self.rows[pid].product
+            subtotal = product.price * quantity
+            total += subtotal
+            items.append({
+                'product': product, 'quantity': quantity, 'subtotal': subtotal,
+                'price_when_added': self.rows[pid].unit_price,
+            })
+        return items, total
+
+    def save(self, lines, response):
+        SavedCart.objects.bulk_create(
+            [SavedCart(user_id=self.user_id, updated_at=timezone.now())],
+            update_conflicts=True, unique_fields=['user'], update_fields=['updated_at'],
+        )
+        removed = self.rows.keys() - lines.keys()
+        if removed:
+            CartItem.objects.filter(cart_id=self.user_id, product_id__in=removed).delete()
+        changed = {pid: qty for pid, qty in lines.items()
+                   if pid not in self.rows or self.rows[pid].quantity != qty}
+        if not changed:
+            return
+        prices = {pid: self.rows[pid].unit_price for pid in changed if pid in self.rows}
+        new = changed.keys() - prices.keys()
+        if new:
+            prices.update(Product.objects.filter(pk__in=new).values_list('id', 'price'))
+        CartItem.objects.bulk_create(
+            [CartItem(cart_id=self.user_id, product_id=pid, quantity=qty, unit_price=prices[pid])
+             for pid, qty in changed.items() if pid in prices],
+            update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity'],
+        )
+
+    def clear(self, response):
+        CartItem.objects.filter(cart_id=self.user_id).delete()
+
+
+def storage_for(request, signed_in=None):
+    """Anonymous shoppers use ``CART_STORAGE``; signed-in ones ``CART_USER_STORAGE``."""
+    if signed_in is None:
+        signed_in = request.user.is_authenticated
+    name = getattr(settings, 'CART_STORAGE', 'cookie')
+    if signed_in:
+        name = getattr(settings, 'CART_USER_STORAGE', name)
+    return import_string(STORAGES.get(name, name))(request)
+
+
+class Cart:
+    """The shopper's cart: ``{product id: quantity}`` plus pricing.
+
+    Lines are loaded on first use and written back once, by CartMiddleware,
+    only if something changed, so viewing pages never writes anything.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.storage = None
+        self._lines = None
+        self.modified = False
+        self._discarded = []
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self.storage = storage_for(self.request)
+            self._lines = self.storage.load()
+        return self._lines
+
+    def add(self, product_id, quantity=1):
+        self.lines[product_id] = self.lines.get(product_id, 0) + quantity
+        self.modified = True
+
+    def update(self, product_id, quantity):
+        """Set a line's quantity (at least 1). Returns False if it isn't in the cart."""
+        if product_id not in self.lines:
+            return False
+        self.lines[product_id] = max(1, quantity)
+        self.modified = True
+        return True
+
+    def remove(self, product_id):
+        if self.lines.pop(product_id, None) is None:
+            return False
+        self.modified = True
+        return True
+
+    def clear(self):
+        self.lines.clear()
+        self.modified = True
+
+    def merge(self, lines):
+        for pid, qty in lines.items():
+            self.lines[pid] = self.lines.get(pid, 0) + qty
+        if lines:
+            self.modified = True
+
+    def priced(self):
+        """``(items, total)`` exactly as ``price_cart`` returns them."""
+        lines = self.lines
+        priced = getattr(self.storage, 'priced', None)
+        result = priced(lines) if priced else None
+        return result if result is not None else price_cart(lines)
+
+    def login(self):
+        """Called after login: move the anonymous lines into the user's storage."""
+        if self._lines is None:
+            # request.user is already the new user; read what they had before.
+            self.storage = storage_for(self.request, signed_in=False)
+            self._lines = self.storage.load()
+        anonymous = self._lines
+        old_storage = self.storage
+        self.storage = storage_for(self.request)
+        if type(self.storage) is type(old_storage):
+            return  # same place before and after login; nothing to move
+        self._discarded.append(old_storage)
+        self._lines = self.storage.load()
+        self.merge(anonymous)
+
+    @property
+    def count(self):
+        return sum(self.lines.values())
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def persist(self, response):
+        for storage in self._discarded:
+            storage.clear(response)
+        if not self.modified:
+            return
+        if self._lines:
+            self.storage.save(self._lines, response)
+        else:
+            self.storage.clear(response)
+        self.modified = False
@@ -0,0 +1,120 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+from django.template.loader import render_to_string
+
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'catalog')]
+
+
+def generation(scope):
+    """Current version token for a group of fragments (e.g. one listing).
+
+    Keys embed the token, so bumping it orphans every fragment in the group
+    at once. A fresh random token is used when the old one was evicted, so
+    stale fragments can never come back.
+    """
+    cache = get_cache()
+    key = f'catalog:gen:{scope}'
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        token = cache.get(key)
+    return token
+
+
+def bump(*scopes):
+    get_cache().set_many({f'catalog:gen:{scope}': uuid.uuid4().hex for scope in scopes}, timeout=None)
+
+
+def listing_key(scope, *parts):
+    return ':'.join(['catalog', scope, generation(scope), *map(str, parts)])
+
+
+def product_key(slug):
+    return f'catalog:product:{slug}'
+
+
+def _count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_or_render(key, template_name, build_context):
+    """Return cached HTML for ``key``, rendering and storing it on a miss.
+
+    ``build_context`` is only called on a miss, so the queries behind it are
+    skipped entirely when the fragment is cached. Fragments are rendered
+    without the request and must not contain CSRF tokens or per-user data.
+    """
+    cache = get_cache()
+    html = cache.get(key)
+    if html is not None:
+        _count(HITS_KEY)
+        return html
+    _count(MISSES_KEY)
+    html = render_to_string(template_name, build_context())
+    cache.set(key, html)
+    return html
+
+
+def category_tree():
+    """All categories by name, each with ``product_count`` (available products).
+
+    One annotated query, cached per 'categories' generation so the nav, the
+    category grid and any other page share it instead of counting again.
+    """
+    from ..models import Category
+    key = listing_key('categories', 'tree')
+    tree = get_cache().get(key)
+    if tree is None:
+        tree = list(
+            Category.objects.annotate(product_count=Count('products', filter=Q(products__available=True)))
+            .order_by('name')
+        )
+        get_cache().set(key, tree)
+    return tree
+
+
+def stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+        'backend': cache.__class__.__name__,
+    }
+
+
+def invalidate_product(product, old_slug=None, old_category_id=None):
+    """Drop exactly the fragments a product change can affect."""
+    # 'categories' because the per-category product counts may have changed.
+    scopes = {'listing:all', 'categories'}
+    for category_id in (product.category_id, old_category_id):
+        if category_id:
+            scopes.add(f'listing:category:{category_id}')
+    bump(*scopes)
+    get_cache().delete_many({product_key(slug) for slug in (product.slug, old_slug) if slug})
+
+
+def invalidate_category(category):
+    bump('categories', f'listing:category:{category.pk}')
+
+
+def invalidate_catalog(category_ids=(), product_slugs=()):
+    """After a bulk change that skipped the per-row signals."""
+    bump('listing:all', 'categories', *(f'listing:category:{pk}' for pk in category_ids))
+    get_cache().delete_many([product_key(slug) for slug in product_slugs])
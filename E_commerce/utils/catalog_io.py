@@ -0,0 +1,147 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.utils.text import slugify
+
+from ..models import Category, Product
+from .slugs import assign_slugs
+
+FORMATS = ('csv', 'jsonl')
+FIELDS = ('slug', 'name', 'category', 'category_name', 'price', 'stock', 'available', 'description', 'image')
+UPDATE_FIELDS = ['name', 'category', 'price', 'stock', 'available', 'description', 'image']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class RowError(ValueError):
+    def __init__(self, line, message):
+        self.line = line
+        super().__init__(f"line {line}: {message}")
+
+
+def guess_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line number, dict)`` one row at a time; never loads the file."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise RowError(line_no, f"invalid JSON ({exc.msg} at column {exc.colno})") from None
+            if not isinstance(row, dict):
+                raise RowError(line_no, "expected a JSON object")
+            yield line_no, row
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _clean(value):
+    return '' if value is None else str(value).strip()
+
+
+class CategoryMap:
+    """Category slug -> id, loaded once; unknown slugs are created on demand."""
+
+    def __init__(self):
+        self.ids = dict(Category.objects.values_list('slug', 'id'))
+
+    def resolve(self, rows):
+        missing = {}
+        for row in rows:
+            slug = slugify(_clean(row.get('category')))
+            if slug and slug not in self.ids:
+                missing[slug] = _clean(row.get('category_name')) or _clean(row.get('category'))
+        if missing:
+            Category.objects.bulk_create(
+                [Category(slug=slug, name=name) for slug, name in missing.items()], ignore_conflicts=True
+            )
+            self.ids.update(Category.objects.filter(slug__in=missing).values_list('slug', 'id'))
+
+    def get(self, value):
+        return self.ids.get(slugify(_clean(value)))
+
+
+def product_from_row(line, row, categories):
+    name = _clean(row.get('name'))
+    if not name:
+        raise RowError(line, "name is required")
+    try:
+        price = Decimal(_clean(row.get('price')))
+    except InvalidOperation:
+        raise RowError(line, f"bad price {row.get('price')!r}") from None
+    stock = _clean(row.get('stock'))
+    if stock and not stock.isdigit():
+        raise RowError(line, f"bad stock {row.get('stock')!r}")
+    available = row.get('available', True)
+    if not isinstance(available, bool):
+        available = _clean(available).lower() in TRUE_VALUES if _clean(available) else True
+    product = Product(
+        slug=slugify(_clean(row.get('slug'))),
+        name=name,
+        category_id=categories.get(row.get('category')),
+        price=price,
+        stock=int(stock) if stock else None,
+        available=available,
+        description=_clean(row.get('description')),
+        image=_clean(row.get('image')) or None,
+    )
+    # Columns the row left out keep their stored values on an update.
+    product.import_fields = tuple(field for field in UPDATE_FIELDS if field in row)
+    return product
+
+
+def upsert_products(products):
+    """Insert new slugs and update existing ones, one statement per set of columns.
+
+    Rows without a slug get one allocated (and so are always new). When a
+    slug repeats inside the batch the last row wins, as it would row by row.
+    An existing product only has the fields its row carried overwritten.
+    """
+    assign_slugs(products)
+    products = list({p.slug: p for p in products}.values())
+    groups = {}
+    for product in products:
+        groups.setdefault(getattr(product, 'import_fields', tuple(UPDATE_FIELDS)), []).append(product)
+    for fields, group in groups.items():
+        Product.objects.bulk_create(group, update_conflicts=True, unique_fields=['slug'], update_fields=fields)
+    return products
+
+
+def export_rows():
+    """All products as import-compatible dicts, streamed from the database."""
+    rows = Product.objects.order_by('id').values_list(
+        'slug', 'name', 'category__slug', 'category__name', 'price', 'stock', 'available', 'description', 'image'
+    )
+    for values in rows.iterator(chunk_size=2000):
+        row = dict(zip(FIELDS, values))
+        row['price'] = str(row['price'])
+        yield row
+
+
+def write_rows(stream, rows, fmt):
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+    else:
+        for count, row in enumerate(rows, 1):
+            stream.write(json.dumps(row) + '\n')
+    return count
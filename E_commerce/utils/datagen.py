@@ -0,0 +1,261 @@
+import itertools
+import math
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.text import slugify
+
+from ..models import Category, Order, OrderItem, Product, Profile
+from .benchmark import WORDS
+
+CITIES = (
+    ("Chennai", "TN", "600"), ("Madurai", "TN", "625"), ("Coimbatore", "TN", "641"), ("Mumbai", "MH", "400"),
+    ("Pune", "MH", "411"), ("Bengaluru", "KA", "560"), ("Mysuru", "KA", "570"), ("Delhi", "DL", "110"),
+    ("Hyderabad", "TS", "500"), ("Kolkata", "WB", "700"), ("Kochi", "KL", "682"), ("Jaipur", "RJ", "302"),
+)
+FIRST_NAMES = "Asha Ravi Priya Arjun Meena Karthik Divya Vikram Lakshmi Rahul Anjali Suresh Kavya Nikhil Deepa".split()
+LAST_NAMES = "Kumar Sharma Iyer Reddy Nair Patel Singh Rao Das Menon Gupta Pillai Joshi Bose Verma".split()
+ADJECTIVES = "classic premium compact deluxe eco smart vintage ultra everyday pro".split()
+
+
+def next_number(model, field='id'):
+    """Start numbering generated rows after what's there, so reruns don't collide."""
+    return (model.objects.aggregate(top=Max(field))['top'] or 0) + 1
+
+
+class Zipf:
+    """Draws items with probability proportional to ``1 / rank ** s``.
+
+    Ranks are a shuffled permutation of ``items`` so the popular ones are
+    spread over the id range rather than being the oldest rows.
+    """
+
+    def __init__(self, items, s, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(itertools.accumulate(1 / rank ** s for rank in range(1, len(self.items) + 1)))
+        self.rng = rng
+
+    def draw(self, k=1):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def draw_distinct(self, k):
+        k = min(k, len(self.items))
+        picked = {}
+        while len(picked) < k:
+            for item in self.draw(k - len(picked)):
+                picked.setdefault(item, None)
+        return list(picked)
+
+
+class ZipfRange:
+    """Draws ids in ``low``..``high`` with probability about ``1 / rank ** s``.
+
+    Like ``Zipf`` but with no table per item, so memory doesn't grow with the
+    range: ranks come from the continuous power law's inverse CDF, and rank
+    ``r`` is the id at ``offset + (r - 1) * stride`` modulo the range size.
+    The stride is coprime to the size, so that is a permutation, and it
+    spreads the popular ids over the range.
+    """
+
+    def __init__(self, low, high, s, rng):
+        self.low, self.size, self.s, self.rng = low, high - low + 1, s, rng
+        self.offset = rng.randrange(self.size)
+        self.stride = rng.randrange(1, self.size + 1) if self.size > 1 else 1
+        while math.gcd(self.stride, self.size) != 1:
+            self.stride += 1
+
+    def _rank(self):
+        u = self.rng.random()
+        if abs(self.s - 1) < 1e-9:
+            x = (self.size + 1) ** u
+        else:
+            x = (((self.size + 1) ** (1 - self.s) - 1) * u + 1) ** (1 / (1 - self.s))
+        return min(int(x), self.size)
+
+    def draw(self, k=1):
+        return [self.low + (self.offset + (self._rank() - 1) * self.stride) % self.size for _ in range(k)]
+
+    def draw_distinct(self, k):
+        k = min(k, self.size)
+        picked = {}
+        while len(picked) < k:
+            for item in self.draw(k - len(picked)):
+                picked.setdefault(item, None)
+        return list(picked)
+
+
+def fetch_rows(queryset, ids, fields, chunk_size=900):
+    """``{id: (field values...)}`` for those of ``ids`` that exist, a chunk of ids per query."""
+    ids = sorted(set(ids))
+    rows = {}
+    for start in range(0, len(ids), chunk_size):
+        for pk, *rest in queryset.filter(pk__in=ids[start:start + chunk_size]).values_list('pk', *fields):
+            rows[pk] = rest
+    return rows
+
+
+def id_range(model):
+    bounds = model.objects.aggregate(low=Min('id'), high=Max('id'))
+    return bounds['low'], bounds['high']
+
+
+class DataGenerator:
+    """Bulk-creates a synthetic catalog, customers and order history.
+
+    Every row goes in through ``bulk_create`` in ``batch_size`` chunks, one
+    transaction per chunk, so no save() or signal runs; the caller rebuilds
+    the search index, rollups and cache once at the end. The same seed on
+    the same starting database gives the same data.
+    """
+
+    def __init__(self, seed=0, batch_size=5000, days=365, zipf_s=1.1, log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.zipf_s = zipf_s
+        self.log = log or (lambda message: None)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def _when(self):
+        return self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def _insert(self, model, rows, label):
+        """Bulk create ``rows`` (an iterable of unsaved instances) in batches."""
+        total = 0
+        for batch in iter(lambda: list(itertools.islice(rows, self.batch_size)), []):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            total += len(batch)
+            self.log(f"  {label}: {total}")
+        return total
+
+    def categories(self, count):
+        start = next_number(Category)
+        names = [f"{self.rng.choice(ADJECTIVES).title()} {self.rng.choice(WORDS).title()} {start + i}"
+                 for i in range(count)]
+        rows = (Category(name=name, slug=slugify(name), description=f"Everything {name.lower()}.")
+                for name in names)
+        return self._insert(Category, rows, 'categories')
+
+    def products(self, count):
+        start = next_number(Product)
+        categories = Zipf(Category.objects.values_list('id', flat=True), 1.0, self.rng)
+
+        def rows():
+            for n in range(start, start + count):
+                name = " ".join([self.rng.choice(ADJECTIVES), *self.rng.sample(WORDS, 2)]).title()
+                # Log-normal prices: mostly a few hundred rupees, a long tail of expensive items.
+                price = Decimal(min(round(self.rng.lognormvariate(6.2, 1.0), 2), 99_999_999)).quantize(Decimal('0.01'))
+                yield Product(
+                    name=name,
+                    slug=f"{slugify(name)}-{n}",
+                    price=price,
+                    description=" ".join(self.rng.choices(WORDS, k=self.rng.randint(8, 30))).capitalize() + ".",
+                    category_id=categories.draw()[0] if categories.items else None,
+                    available=self.rng.random() < 0.97,
+                    stock=None if self.rng.random() < 0.3 else self.rng.randint(0, 500),
+                    created_at=self._when(),
+                )
+        return self._insert(Product, rows(), 'products')
+
+    def users(self, count, password='password'):
+        start = next_number(User)
+        hashed = make_password(password)  # hashing is slow; every generated user shares one
+        joined = self.now - timedelta(days=self.days)
+
+        def rows():
+            # Numbered after the highest id, skipping any userN someone already has.
+            n, made = start, 0
+            while made < count:
+                numbers = range(n, n + min(count - made, self.batch_size))
+                taken = set(User.objects.filter(username__in=[f"user{i}" for i in numbers])
+                            .values_list('username', flat=True))
+                for i in numbers:
+                    if f"user{i}" in taken:
+                        continue
+                    first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                    yield User(username=f"user{i}", email=f"user{i}@example.com", first_name=first,
+                               last_name=last, password=hashed, date_joined=joined)
+                    made += 1
+                n = numbers.stop
+        created = self._insert(User, rows(), 'users')
+
+        def profiles():
+            users = User.objects.filter(id__gte=start, profile__isnull=True).values_list('id', flat=True)
+            for user_id in users.iterator(chunk_size=self.batch_size):
+                city, state, pin = self.rng.choice(CITIES)
+                yield Profile(user_id=user_id, phone=f"9{self.rng.randrange(10 ** 9):09d}",
+                              address=f"{self.rng.randint(1, 999)} {self.rng.choice(LAST_NAMES)} Street",
+                              city=city, state=state, pin_code=f"{pin}{self.rng.randrange(1000):03d}")
+        self._insert(Profile, profiles(), 'profiles')
+        return created
+
+    def orders(self, count, max_items=5):
+        """``count`` orders from the profiles on file, their products drawn Zipf-distributed.
+
+        Products and customers are drawn as ids over their id ranges and
+        only the drawn rows are read, a batch at a time, so memory stays
+        bounded however big the catalog is.
+        """
+        low, high = id_range(Product)
+        if low is None:
+            return 0
+        popularity = ZipfRange(low, high, self.zipf_s, self.rng)
+        profile_low, profile_high = id_range(Profile)
+        profiles = Profile.objects.select_related('user')
+        product_fields = ('name', 'slug', 'price')
+        # Placed in time order, so order ids increase with created_at as they would live.
+        times = sorted(self._when() for _ in range(count))
+
+        total = 0
+        for offset in range(0, count, self.batch_size):
+            batch_times = times[offset:offset + self.batch_size]
+            wanted = [popularity.draw_distinct(min(self.rng.randint(1, max_items), self.rng.randint(1, max_items)))
+                      for _ in batch_times]
+            products = fetch_rows(Product.objects, itertools.chain.from_iterable(wanted), product_fields)
+            buyers = [self.rng.randint(profile_low, profile_high) if profile_low else None for _ in batch_times]
+            customers = fetch_rows(profiles, filter(None, buyers), (
+                'user__first_name', 'user__last_name', 'phone', 'address', 'city', 'state', 'pin_code'))
+
+            orders, lines = [], []
+            for created_at, drawn, buyer in zip(batch_times, wanted, buyers):
+                if buyer in customers:
+                    first, last, phone, address, city, state, pin = customers[buyer]
+                else:  # no profiles, or a gap in their ids
+                    first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                    phone, address = f"9{self.rng.randrange(10 ** 9):09d}", "1 Market Road"
+                    city, state, pin = self.rng.choice(CITIES)
+                picked = [pk for pk in drawn if pk in products]
+                while not picked:  # every draw hit a deleted id
+                    extra = popularity.draw_distinct(max_items)
+                    products.update(fetch_rows(Product.objects, extra, product_fields))
+                    picked = [pk for pk in extra if pk in products]
+                items = []
+                for product_id in picked:
+                    name, slug, price = products[product_id]
+                    quantity = 1 if self.rng.random() < 0.8 else self.rng.randint(2, 4)
+                    items.append(OrderItem(product_id=product_id, product_name=name, product_slug=slug,
+                                           quantity=quantity, price=price, subtotal=price * quantity))
+                orders.append(Order(
+                    full_name=f"{first} {last}".strip() or "Guest", phone=phone or "9000000000",
+                    address_line1=address or "1 Market Road", city=city or "Chennai", state=state,
+                    postal_code=pin, created_at=created_at, total_amount=sum(it.subtotal for it in items),
+                ))
+                lines.append(items)
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                for order, items in zip(orders, lines):
+                    for item in items:
+                        item.order_id = order.pk
+                OrderItem.objects.bulk_create([item for items in lines for item in items],
+                                              batch_size=self.batch_size)
+            total += len(orders)
+            self.log(f"  orders: {total}")
+        return total
@@ -0,0 +1,86 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (200, 400, 800)
+FORMATS = (
+    # key, Pillow format, extension, save options
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+)
+
+
+def needs_thumbnails(instance):
+    return bool(instance.image) and instance.thumbnails.get('source') != instance.image.name
+
+
+def _widths_for(original_width):
+    widths = [w for w in WIDTHS if w < original_width]
+    if len(widths) < len(WIDTHS):
+        widths.append(original_width)  # never upscale; the original is the largest
+    return widths
+
+
+def render_thumbnails(field_file):
+    """Write every width x format derivative of an image next to it.
+
+    Returns the ``thumbnails`` value stored on the model: the source name,
+    a ``src`` fallback and ready-made ``srcset`` strings per format, so
+    templates print them without asking the storage for a single URL.
+    """
+    storage = field_file.storage
+    with field_file.open('rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    stem, _ = posixpath.splitext(field_file.name)
+    srcsets = {key: [] for key, *_ in FORMATS}
+    for width in _widths_for(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        for key, pil_format, ext, options in FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = storage.save(f"thumbs/{stem}-{width}.{ext}", ContentFile(buffer.getvalue()))
+            srcsets[key].append((width, storage.url(name)))
+
+    return {
+        'source': field_file.name,
+        'src': srcsets['jpeg'][0][1],
+        **{key: ', '.join(f'{url} {width}w' for width, url in pairs) for key, pairs in srcsets.items()},
+    }
+
+
+def generate_thumbnails(model_label, pk):
+    """Background task: (re)build the derivatives for one Product or Category.
+
+    The row is only updated if its image is still the one that was rendered,
+    so a newer upload racing this task can't get an older image's thumbnails.
+    """
+    from . import catalog_cache
+
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not needs_thumbnails(instance):
+        return False
+    try:
+        thumbnails = render_thumbnails(instance.image)
+    except Exception:
+        logger.exception("Thumbnails for %s %s failed", model_label, pk)
+        return False
+    updated = model.objects.filter(pk=pk, image=instance.image.name).update(thumbnails=thumbnails)
+    # .update() skips the save signals, so drop the cached fragments by hand.
+    instance.thumbnails = thumbnails
+    if model_label == 'E_commerce.Product':
+        catalog_cache.invalidate_product(instance)
+    else:
+        catalog_cache.invalidate_category(instance)
+    return bool(updated)
@@ -0,0 +1,34 @@
+from django.db.models import F, Q
+
+from ..models import Product
+
+
+class OutOfStockError(Exception):
+    def __init__(self, product_id, requested, name=None):
+        self.product_id = product_id
+        self.requested = requested
+        label = name or f"product {product_id}"
+        super().__init__(f"Sorry, there isn't enough stock of {label} for {requested}.")
+
+
+def reserve_stock(quantities, names=None):
+    """Take ``{product_id: qty}`` out of stock, all or nothing.
+
+    Each line is one conditional ``UPDATE ... SET stock = stock - qty WHERE
+    stock >= qty``: no ``SELECT ... FOR UPDATE`` and no read-modify-write
+    window, the check and the decrement happen in the same statement.  Lines
+    are applied in product id order so concurrent checkouts always lock rows
+    in the same order and cannot deadlock each other.  Products with untracked (NULL) stock always
+    succeed.  Must run inside ``transaction.atomic`` so a failure on a later
+    line rolls back the earlier ones.
+    """
+    for product_id in sorted(quantities):
+        qty = quantities[product_id]
+        updated = (
+            Product.objects.filter(pk=product_id)
+            .filter(Q(stock__isnull=True) | Q(stock__gte=qty))
+            .update(stock=F('stock') - qty)
+        )
+        if not updated:
+            raise OutOfStockError(product_id, qty, (names or {}).get(product_id))
+
@@ -1,61 +1,113 @@
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet
 
-def generate_invoice_pdf(order, company_name="E-Shop"):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                            rightMargin=20*mm, leftMargin=20*mm,
-                            topMargin=20*mm, bottomMargin=20*mm)
-    styles = getSampleStyleSheet()
+# Built once per process and shared by every invoice rendered in it.
+STYLES = getSampleStyleSheet()
+COL_WIDTHS = [20*mm, 70*mm, 25*mm, 20*mm, 30*mm]
+ITEMS_TABLE_STYLE = TableStyle([
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
+    ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTNAME", (3, -1), (4, -1), "Helvetica-Bold"),  # bold total row
+    ("BACKGROUND", (3, -1), (4, -1), colors.whitesmoke),
+])
+PAGE_MARGINS = dict(rightMargin=20*mm, leftMargin=20*mm, topMargin=20*mm, bottomMargin=20*mm)
+
+
+def invoice_data(order):
+    """Plain, picklable snapshot of everything an invoice needs.
+
+    Load the order through ``Order.objects.with_items()`` to keep this free
+    of queries.
+    """
+    return {
+        'id': order.id,
+        'full_name': order.full_name,
+        'phone': order.phone,
+        'address': f"{order.address_line1}, {order.city}, {order.state} - {order.postal_code}",
+        'items': [
+            (item.product_name, float(item.price), item.quantity, float(item.subtotal))
+            for item in order.items.all()
+        ],
+    }
+
+
+def build_invoice_story(data, company_name="E-Shop"):
     elems = []
 
-    elems.append(Paragraph(f"<b>{company_name}</b>", styles['Title']))
+    elems.append(Paragraph(f"<b>{company_name}</b>", STYLES['Title']))
     elems.append(Spacer(1, 12))
-    elems.append(Paragraph(f"<b>Invoice # {order.id}</b>", styles['Heading3']))
-    elems.append(Paragraph(f"Customer: {order.full_name}", styles['Normal']))
-    elems.append(Paragraph(f"Phone: {order.phone}", styles['Normal']))
-    elems.append(Paragraph(
-        f"Address: {order.address_line1}, {order.city}, {order.state} - {order.postal_code}",
-        styles['Normal']
-    ))
+    elems.append(Paragraph(f"<b>Invoice # {data['id']}</b>", STYLES['Heading3']))
+    elems.append(Paragraph(f"Customer: {data['full_name']}", STYLES['Normal']))
+    elems.append(Paragraph(f"Phone: {data['phone']}", STYLES['Normal']))
+    elems.append(Paragraph(f"Address: {data['address']}", STYLES['Normal']))
     elems.append(Spacer(1, 12))
 
     # ===== Items Table =====
-    data = [["#", "Product", "Price", "Qty", "Subtotal"]]
+    rows = [["#", "Product", "Price", "Qty", "Subtotal"]]
     total = 0.0
 
-    for i, item in enumerate(order.items.all(), start=1):
-        subtotal = float(item.subtotal)
+    for i, (name, price, quantity, subtotal) in enumerate(data['items'], start=1):
         total += subtotal
-        data.append([
-            i,
-            item.product.name,
-            f"Rs. {item.price:.2f}",
-            item.quantity,
-            f"Rs. {subtotal:.2f}"
-        ])
-
-    data.append(["", "", "", "Total", f"Rs. {total:.2f}"])
-
-    table = Table(data, colWidths=[20*mm, 70*mm, 25*mm, 20*mm, 30*mm])
-    table.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
-        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTNAME", (3, -1), (4, -1), "Helvetica-Bold"),  # bold total row
-        ("BACKGROUND", (3, -1), (4, -1), colors.whitesmoke),
-    ]))
+        rows.append([i, name, f"Rs. {price:.2f}", quantity, f"Rs. {subtotal:.2f}"])
+
+    rows.append(["", "", "", "Total", f"Rs. {total:.2f}"])
+
+    table = Table(rows, colWidths=COL_WIDTHS)
+    table.setStyle(ITEMS_TABLE_STYLE)
     elems.append(table)
 
     elems.append(Spacer(1, 12))
-    elems.append(Paragraph("Thank you for shopping with E-Shop!", styles['Italic']))
+    elems.append(Paragraph(f"Thank you for shopping with {company_name}!", STYLES['Italic']))
+    return elems
 
-    doc.build(elems)
+
+def _build_pdf(story):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, **PAGE_MARGINS)
+    doc.build(story)
     pdf = buffer.getvalue()
     buffer.close()
     return pdf
+
+
+def render_invoice_data(data, company_name="E-Shop"):
+    return data['id'], _build_pdf(build_invoice_story(data, company_name))
+
+
+def generate_invoice_pdf(order, company_name="E-Shop"):
+    return render_invoice_data(invoice_data(order), company_name)[1]
+
+
+def render_invoices(orders, workers=1, company_name="E-Shop", chunksize=8):
+    """Render many invoices, yielding ``(order_id, pdf_bytes)`` pairs.
+
+    ``orders`` is an ``Order`` queryset; its items are prefetched up front
+    and each line's product name comes from the item's snapshot, so Product
+    is never read.  With ``workers > 1`` layout is fanned out over a
+    process pool, which only ever sees plain data, never model instances.
+    """
+    datas = [invoice_data(order) for order in orders.with_items()]
+    if workers <= 1:
+        for data in datas:
+            yield render_invoice_data(data, company_name)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        names = [company_name] * len(datas)
+        yield from pool.map(render_invoice_data, datas, names, chunksize=chunksize)
+
+
+def render_merged_invoices(orders, company_name="E-Shop"):
+    """Render every invoice into a single document, one order per page run."""
+    story = []
+    for order in orders.with_items():
+        if story:
+            story.append(PageBreak())
+        story.extend(build_invoice_story(invoice_data(order), company_name))
+    return _build_pdf(story)
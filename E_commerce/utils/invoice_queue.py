@@ -0,0 +1,67 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Order
+from .invoice import generate_invoice_pdf
+from .tasks import run_in_background
+
+logger = logging.getLogger(__name__)
+
+Status = Order.InvoiceStatus
+IN_FLIGHT = (Status.PENDING, Status.RENDERING)
+
+
+def enqueue_invoice(order):
+    """Mark the order's invoice as pending and schedule it for rendering.
+
+    The ``invoice_status`` column is the queue: rows stay ``pending`` until a
+    background thread or the ``invoice_worker`` command claims them.
+    """
+    Order.objects.filter(pk=order.pk).update(
+        invoice_status=Status.PENDING, invoice_updated_at=timezone.now()
+    )
+    order.invoice_status = Status.PENDING
+    transaction.on_commit(lambda: run_in_background(render_invoice, order.pk))
+
+
+def render_invoice(order_id):
+    """Render and store one invoice. Returns False if someone else claimed it."""
+    claimed = Order.objects.filter(pk=order_id, invoice_status=Status.PENDING).update(
+        invoice_status=Status.RENDERING, invoice_updated_at=timezone.now()
+    )
+    if not claimed:
+        return False
+
+    order = Order.objects.with_items().get(pk=order_id)
+    start = time.perf_counter()
+    try:
+        pdf_bytes = generate_invoice_pdf(order)
+        logger.info("Rendered invoice for order %s in %.1fms", order_id, (time.perf_counter() - start) * 1000)
+        order.invoice.save(f"invoice_{order.id}.pdf", ContentFile(pdf_bytes), save=False)
+        order.invoice_status = Status.READY
+    except Exception:
+        logger.exception("Rendering invoice for order %s failed", order_id)
+        order.invoice_status = Status.FAILED
+    order.invoice_updated_at = timezone.now()
+    order.save(update_fields=['invoice', 'invoice_status', 'invoice_updated_at'])
+    return order.invoice_status == Status.READY
+
+
+def requeue_stale(max_age=timedelta(minutes=10)):
+    """Put back jobs whose renderer died mid-flight."""
+    cutoff = timezone.now() - max_age
+    return Order.objects.filter(
+        invoice_status=Status.RENDERING, invoice_updated_at__lt=cutoff
+    ).update(invoice_status=Status.PENDING)
+
+
+def pending_invoice_ids(limit):
+    return list(
+        Order.objects.filter(invoice_status=Status.PENDING)
+        .order_by('id').values_list('id', flat=True)[:limit]
+    )
@@ -0,0 +1,105 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ..models import Order, OrderItem
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+CHUNK_SIZE = 2000
+ORDER_FIELDS = (
+    'id', 'created_at', 'full_name', 'phone', 'address_line1', 'address_line2',
+    'city', 'state', 'postal_code', 'total_amount', 'invoice_status',
+)
+ITEM_FIELDS = ('product_id', 'product_name', 'product_slug', 'quantity', 'price', 'subtotal')
+CSV_HEADER = [f'order_{f}' if f == 'id' else f for f in ORDER_FIELDS] + [f'item_{f}' for f in ITEM_FIELDS]
+# Spreadsheets run a cell starting with one of these as a formula.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object whose write() hands the line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def parse_range(start, end):
+    """``?start=&end=`` (inclusive dates, either may be blank) -> datetime bounds.
+
+    Raises ValueError on a malformed date.
+    """
+    bounds = []
+    for value, shift in ((start, 0), (end, 1)):
+        if not value:
+            bounds.append(None)
+            continue
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        bounds.append(timezone.make_aware(datetime.combine(day + timedelta(days=shift), time.min)))
+    return tuple(bounds)
+
+
+def _in_range(queryset, prefix, since, until):
+    if since:
+        queryset = queryset.filter(**{f'{prefix}created_at__gte': since})
+    if until:
+        queryset = queryset.filter(**{f'{prefix}created_at__lt': until})
+    return queryset
+
+
+def iter_orders(since=None, until=None):
+    """Yield ``(order values, [item values])`` in (created_at, id) order.
+
+    Orders and items are two ``values_list().iterator()`` streams sorted the
+    same way and merged, so neither model instances nor the whole result
+    set are ever held in memory. The range filter walks the created_at index.
+    """
+    orders = _in_range(Order.objects.all(), '', since, until).order_by('created_at', 'id')
+    items = _in_range(OrderItem.objects.all(), 'order__', since, until).order_by('order__created_at', 'order_id', 'id')
+    items = items.values_list('order__created_at', 'order_id', *ITEM_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+    pending = next(items, None)
+    for order in orders.values_list(*ORDER_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        key = (order[1], order[0])
+        # Items of an order deleted between the two queries sort before it: skip them.
+        while pending is not None and pending[:2] < key:
+            pending = next(items, None)
+        lines = []
+        while pending is not None and pending[:2] == key:
+            lines.append(pending[2:])
+            pending = next(items, None)
+        yield order, lines
+
+
+def _cell(value):
+    """Customer-typed text, quoted with a leading ' if a spreadsheet would evaluate it."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(orders):
+    """One row per item; an order without items gets a single row."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    blank = ('',) * len(ITEM_FIELDS)
+    for order, lines in orders:
+        for line in lines or [blank]:
+            yield writer.writerow([_cell(value) for value in order + line])
+
+
+def jsonl_lines(orders):
+    """One JSON object per order with its items nested."""
+    for order, lines in orders:
+        row = dict(zip(ORDER_FIELDS, order))
+        row['items'] = [dict(zip(ITEM_FIELDS, line)) for line in lines]
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(fmt, since=None, until=None):
+    lines = csv_lines if fmt == 'csv' else jsonl_lines
+    return lines(iter_orders(since, until))
@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from ..models import Order, OrderItem, Product
+from .inventory import reserve_stock
+from .recommendations import bump_pairs
+from .sales import record_order
+
+SHIPPING_FIELDS = ('full_name', 'phone', 'address_line1', 'address_line2', 'city', 'state', 'postal_code')
+
+
+class EmptyCartError(Exception):
+    pass
+
+
+def price_cart(cart):
+    """Resolve a session cart (``{'<product id>': qty}``) against the catalog.
+
+    All products are loaded in one query. Returns ``(items, total)`` where each
+    item is ``{'product', 'quantity', 'subtotal'}``; unknown products and
+    non-positive quantities are dropped.
+    """
+    quantities = {}
+    for pid, qty in cart.items():
+        try:
+            pid, qty = int(pid), int(qty)
+        except (TypeError, ValueError):
+            continue
+        if qty > 0:
+            quantities[pid] = qty
+
+    product_map = Product.objects.in_bulk(list(quantities))
+    items = []
+    total = Decimal('0.00')
+    for pid, quantity in quantities.items():
+        product = product_map.get(pid)
+        if not product:
+            continue
+        subtotal = product.price * quantity
+        total += subtotal
+        items.append({'product': product, 'quantity': quantity, 'subtotal': subtotal})
+    return items, total
+
+
+def shipping_from_post(post):
+    return {field: post.get(field, '').strip() for field in SHIPPING_FIELDS}
+
+
+def validate_shipping(shipping):
+    """Return the first problem with the shipping details, or None."""
+    if not shipping['full_name']:
+        return "Name is required."
+    if not shipping['phone']:
+        return "Phone number is required."
+    if not shipping['phone'].isdigit() or len(shipping['phone']) != 10:
+        return "Phone number must be 10 digits."
+    if not shipping['address_line1']:
+        return "Address is required."
+    if not shipping['city']:
+        return "City is required."
+    if not shipping['state']:
+        return "State is required."
+    if not shipping['postal_code']:
+        return "Postal code is required."
+    return None
+
+
+def create_order(cart, shipping):
+    """Create an order and its items from a cart in a single transaction.
+
+    One query prices the cart, one inserts the order and one bulk-inserts the
+    items, three upserts bump the daily sales rollups and at most three
+    statements the co-purchase counts; stock is reserved with one conditional
+    UPDATE per line.  Raises ``OutOfStockError`` (and writes nothing) if any
+    line can't be filled.
+    """
+    items, total = price_cart(cart)
+    if not items:
+        raise EmptyCartError("Your cart is empty.")
+
+    with transaction.atomic():
+        reserve_stock(
+            {it['product'].id: it['quantity'] for it in items},
+            names={it['product'].id: it['product'].name for it in items},
+        )
+        order = Order.objects.create(total_amount=total, **shipping)
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=it['product'],
+                product_name=it['product'].name,
+                product_slug=it['product'].slug,
+                quantity=it['quantity'],
+                price=it['product'].price,
+                subtotal=it['subtotal'],
+            )
+            for it in items
+        ])
+        record_order(order, items)
+        bump_pairs(it['product'].id for it in items)
+    return order
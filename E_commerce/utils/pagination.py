@@ -0,0 +1,132 @@
+import base64
+import binascii
+import json
+import operator
+from datetime import datetime, timezone
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _json_default(value):
+    # Full precision: a cursor that drops microseconds would skip or repeat rows.
+    if isinstance(value, datetime) and value.tzinfo:
+        value = value.astimezone(timezone.utc)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, count=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Cursor pagination over a fixed, unique ordering.
+
+    Instead of ``OFFSET n`` each page continues from the sort key of the last
+    row seen (``WHERE (created_at, id) < (...)``), so page 10,000 costs the same
+    as page 1 given an index on the ordering. No ``COUNT(*)`` is issued unless
+    ``count=True``. The last ordering field must be unique (normally ``id``).
+    Cursors are opaque url-safe tokens; a bad one raises ``InvalidCursor``.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id'), count=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.with_count = count
+
+    def _token(self, direction, values):
+        raw = json.dumps([direction, values], default=_json_default, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def encode_cursor(self, obj, direction):
+        return self._token(direction, [getattr(obj, field) for field in self.fields])
+
+    def normalize_cursor(self, cursor):
+        """The token this paginator would have issued for ``cursor``'s position.
+
+        Spellings of the same position (padding, spacing, time zones) all
+        map to one token, so it can key a cache.
+        """
+        return self._token(*self.decode_cursor(cursor))
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise ValueError(cursor)
+            model = self.queryset.model
+            values = [model._meta.get_field(f).to_python(v) for f, v in zip(self.fields, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError) as exc:
+            raise InvalidCursor(cursor) from exc
+        return direction, values
+
+    def _after(self, values, reverse):
+        """Q for rows strictly after ``values`` in (optionally reversed) sort order.
+
+        The OR-expansion alone can't seek an index, so it is ANDed with the
+        redundant non-strict bound on the leading column (``created_at <= x``),
+        which lets the planner start the index range scan at the cursor.
+        """
+        conditions = []
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            lookup = f"{self.fields[i]}__{'lt' if descending else 'gt'}"
+            ties = {self.fields[j]: values[j] for j in range(i)}
+            conditions.append(Q(**ties, **{lookup: values[i]}))
+        after = reduce(operator.or_, conditions)
+        if len(conditions) > 1:
+            descending = self.ordering[0].startswith('-') != reverse
+            after &= Q(**{f"{self.fields[0]}__{'lte' if descending else 'gte'}": values[0]})
+        return after
+
+    def get_page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor) if cursor else ('next', None)
+        backwards = direction == 'prev'
+        ordering = self.ordering
+        if backwards:
+            ordering = [name[1:] if name.startswith('-') else '-' + name for name in ordering]
+
+        qs = self.queryset.order_by(*ordering)
+        if values is not None:
+            qs = qs.filter(self._after(values, reverse=backwards))
+        rows = list(qs[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        has_next = more if not backwards else True
+        has_previous = (values is not None) if not backwards else more
+        return KeysetPage(
+            rows,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_cursor=self.encode_cursor(rows[-1], 'next') if has_next and rows else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if has_previous and rows else None,
+            count=self.queryset.count() if self.with_count else None,
+        )
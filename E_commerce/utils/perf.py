@@ -0,0 +1,164 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the request-time histogram buckets; the last is open.
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = ContextVar('perf_recorder', default=None)
+
+
+class RequestTimings:
+    """What one request spent its time on, filled in while it runs."""
+
+    def __init__(self, request):
+        self.request = request
+        self.started = time.perf_counter()
+        self.spans = {}  # name -> ms
+        self.queries = 0
+        self.db_ms = 0.0
+        self._open = set()
+
+    @property
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return (match and match.view_name) or '<unmatched>'
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def add(self, name, ms):
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.db_ms += ms
+            if ms >= getattr(settings, 'PERF_SLOW_QUERY_MS', 100):
+                logger.warning("Slow query (%.1f ms) in %s: %s", ms, self.view_name, sql)
+
+    def server_timing(self, total_ms):
+        parts = [f'total;dur={total_ms:.1f}', f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"']
+        parts += [f'{name};dur={ms:.1f}' for name, ms in self.spans.items()]
+        return ', '.join(parts)
+
+
+@contextmanager
+def recording(request):
+    timings = RequestTimings(request)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name`` span.
+
+    A no-op outside a request (background threads, commands). Nested blocks
+    with the same name only count once.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._open:
+        yield
+        return
+    timings._open.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._open.discard(name)
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+class ViewStats:
+    """Per-view aggregates for this process, for the staff stats endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, name, timings, total_ms):
+        with self.lock:
+            entry = self.views.get(name)
+            if entry is None:
+                entry = self.views[name] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queries': 0, 'db_ms': 0.0,
+                    'spans': {}, 'buckets': [0] * (len(BUCKETS) + 1),
+                }
+            entry['count'] += 1
+            entry['total_ms'] += total_ms
+            entry['max_ms'] = max(entry['max_ms'], total_ms)
+            entry['queries'] += timings.queries
+            entry['db_ms'] += timings.db_ms
+            for span, ms in timings.spans.items():
+                entry['spans'][span] = entry['spans'].get(span, 0.0) + ms
+            entry['buckets'][bisect.bisect_left(BUCKETS, total_ms)] += 1
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    @staticmethod
+    def _percentile(buckets, count, fraction):
+        # Upper bound of the bucket the percentile falls in (None: over the last bound).
+        seen = 0
+        for bound, n in zip(BUCKETS + (None,), buckets):
+            seen += n
+            if seen >= count * fraction:
+                return bound
+        return None
+
+    def snapshot(self):
+        with self.lock:
+            views = {name: dict(entry, spans=dict(entry['spans']), buckets=list(entry['buckets']))
+                     for name, entry in self.views.items()}
+        labels = [f'le_{bound}' for bound in BUCKETS] + ['over']
+        out = {}
+        for name, entry in sorted(views.items()):
+            count = entry['count']
+            out[name] = {
+                'count': count,
+                'mean_ms': round(entry['total_ms'] / count, 2),
+                'max_ms': round(entry['max_ms'], 2),
+                'p50_ms_at_most': self._percentile(entry['buckets'], count, 0.5),
+                'p95_ms_at_most': self._percentile(entry['buckets'], count, 0.95),
+                'queries_per_request': round(entry['queries'] / count, 2),
+                'db_ms_mean': round(entry['db_ms'] / count, 2),
+                'spans_ms_mean': {span: round(ms / count, 2) for span, ms in entry['spans'].items()},
+                'histogram': dict(zip(labels, entry['buckets'])),
+            }
+        return out
+
+
+stats = ViewStats()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('tpl'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The stock Django template backend, with render time reported under ``tpl``."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,119 @@
+import itertools
+
+from django.db import transaction
+from django.db.models import F, Max
+
+from ..models import CoPurchase, Order, OrderItem
+
+TOP_K = 10
+
+
+def bump_pairs(product_ids, k=TOP_K):
+    """Count one more order containing every pair of ``product_ids``.
+
+    Called from ``create_order`` inside the order's transaction, so the work
+    is bounded: pairs already stored get one UPDATE, and a product's new
+    pairs are inserted only if all of them fit in its ``k`` slots. Choosing
+    some would rank partners by id rather than by how often they're bought
+    together, so then none are, and the product waits for the next
+    ``build_recommendations`` run to pick its top ``k``. Both directions are
+    stored so a product's neighbours are one index range. Pairs left out,
+    or dropped by the last rebuild, come back with only the orders since,
+    so counts are a lower bound until that run.
+    """
+    ids = sorted({pk for pk in product_ids if pk is not None})
+    if len(ids) < 2:
+        return
+    stored = {}
+    for product_id, other_id in CoPurchase.objects.filter(product_id__in=ids).values_list('product_id', 'other_id'):
+        stored.setdefault(product_id, set()).add(other_id)
+    CoPurchase.objects.filter(product_id__in=ids, other_id__in=ids).update(count=F('count') + 1)
+    new = []
+    for a in ids:
+        partners = stored.get(a, set())
+        others = [b for b in ids if b != a and b not in partners]
+        if len(partners) + len(others) <= k:
+            new += [CoPurchase(product_id=a, other_id=b, count=1) for b in others]
+    # A concurrent checkout may have just inserted the same pair; its count stands.
+    CoPurchase.objects.bulk_create(new, ignore_conflicts=True)
+
+
+def co_occurrence(upto_order_id=None):
+    """Product x product co-purchase counts from OrderItem, as sparse matrices.
+
+    Builds the order x product incidence matrix X (1 if the order has the
+    product) and returns ``(product_ids, X.T @ X)`` with the diagonal
+    cleared, so entry (i, j) is the number of orders with both products i
+    and j. NumPy and SciPy are only needed here, by the batch job.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    items = OrderItem.objects.filter(product__isnull=False)
+    if upto_order_id is not None:
+        items = items.filter(order_id__lte=upto_order_id)
+    pairs = items.order_by().values_list('order_id', 'product_id').iterator(chunk_size=10000)
+    flat = np.fromiter(itertools.chain.from_iterable(pairs), dtype=np.int64).reshape(-1, 2)
+    if not len(flat):
+        return np.empty(0, dtype=np.int64), sparse.csr_matrix((0, 0), dtype=np.int32)
+
+    _, order_index = np.unique(flat[:, 0], return_inverse=True)
+    product_ids, product_index = np.unique(flat[:, 1], return_inverse=True)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(flat), dtype=np.int32), (order_index, product_index)),
+        shape=(order_index.max() + 1, len(product_ids)),
+    )
+    incidence.sum_duplicates()
+    incidence.data[:] = 1  # the same product twice in one order is one co-purchase
+    counts = (incidence.T @ incidence).tocsr()
+    counts.setdiag(0)
+    counts.eliminate_zeros()
+    return product_ids, counts
+
+
+def top_neighbours(product_ids, counts, k=TOP_K, min_count=1):
+    """Yield ``(product, other, count)`` for each product's ``k`` best partners."""
+    import numpy as np
+
+    for row in range(counts.shape[0]):
+        start, end = counts.indptr[row], counts.indptr[row + 1]
+        data, others = counts.data[start:end], product_ids[counts.indices[start:end]]
+        keep = data >= min_count
+        data, others = data[keep], others[keep]
+        if len(data) > k:
+            best = np.argpartition(-data, k - 1)[:k]
+            data, others = data[best], others[best]
+        # Highest count first, then lowest id, to match the serving query's order.
+        for i in np.lexsort((others, -data)):
+            yield int(product_ids[row]), int(others[i]), int(data[i])
+
+
+def rebuild(k=TOP_K, min_count=1, batch_size=5000):
+    """Replace CoPurchase with each product's top ``k`` partners. Returns the row count.
+
+    The matrix is built from orders up to a snapshot id without holding a
+    transaction; orders placed meanwhile are re-applied after the swap.
+    """
+    upto = Order.objects.aggregate(top=Max('id'))['top'] or 0
+    product_ids, counts = co_occurrence(upto)
+    rows = (CoPurchase(product_id=a, other_id=b, count=n)
+            for a, b, n in top_neighbours(product_ids, counts, k, min_count))
+    total = 0
+    with transaction.atomic():
+        CoPurchase.objects.all().delete()
+        for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+            CoPurchase.objects.bulk_create(batch)
+            total += len(batch)
+        late = OrderItem.objects.filter(order_id__gt=upto).order_by('order_id').values_list('order_id', 'product_id')
+        for _, group in itertools.groupby(late, key=lambda row: row[0]):
+            bump_pairs(product_id for _, product_id in group)
+    return total
+
+
+def bought_together(product, limit=4):
+    """The products most often ordered with ``product``: one query on co_purchase_top_idx."""
+    return [
+        pair.other for pair in
+        CoPurchase.objects.filter(product=product, other__available=True)
+        .select_related('other').order_by('-count', 'other_id')[:limit]
+    ]
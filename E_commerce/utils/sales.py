@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import DailyCategorySales, DailyProductSales, DailySales, OrderItem
+
+COUNTERS = ('revenue', 'units', 'orders')
+ROLLUPS = (
+    # model, key fields, OrderItem value for each key field
+    (DailySales, ('date',), ()),
+    (DailyProductSales, ('date', 'product'), ('product',)),
+    (DailyCategorySales, ('date', 'category'), ('product__category',)),
+)
+
+
+def _upsert(model, keys, rows):
+    """Add ``rows`` (key values + counters) onto the rollup in one statement.
+
+    ``INSERT ... ON CONFLICT DO UPDATE SET n = n + excluded.n`` (SQLite and
+    PostgreSQL): concurrent checkouts increment the same row without a
+    read-modify-write race, however many lines the order has.
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    key_columns = [qn(model._meta.get_field(f).column) for f in keys]
+    counters = [qn(f) for f in COUNTERS]
+    values = ', '.join(['(' + ', '.join(['%s'] * (len(keys) + len(COUNTERS))) + ')'] * len(rows))
+    sql = (
+        f"INSERT INTO {table} ({', '.join(key_columns + counters)}) VALUES {values} "
+        f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+        + ', '.join(f"{c} = {table}.{c} + excluded.{c}" for c in counters)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def record_order(order, items):
+    """Roll one new order into the daily tables (three statements in all).
+
+    ``items`` are ``price_cart`` lines. Call inside the order's transaction
+    so the rollups can't disagree with the orders that were committed.
+    """
+    day = timezone.localdate(order.created_at)
+    products = defaultdict(lambda: [Decimal('0.00'), 0])
+    categories = defaultdict(lambda: [Decimal('0.00'), 0])
+    for it in items:
+        for bucket, key in ((products, it['product'].id), (categories, it['product'].category_id)):
+            if key is not None:
+                bucket[key][0] += it['subtotal']
+                bucket[key][1] += it['quantity']
+
+    units = sum(it['quantity'] for it in items)
+    _upsert(DailySales, ('date',), [(day, order.total_amount, units, 1)])
+    _upsert(DailyProductSales, ('date', 'product'), [(day, pk, rev, n, 1) for pk, (rev, n) in products.items()])
+    _upsert(DailyCategorySales, ('date', 'category'), [(day, pk, rev, n, 1) for pk, (rev, n) in categories.items()])
+
+
+def day_bounds(first, last):
+    """Aware datetimes covering the local dates ``first`` through ``last``."""
+    def start_of(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+    return start_of(first), start_of(last + timedelta(days=1))
+
+
+def derive(first, last):
+    """Recompute the rollups for a date range straight from OrderItem.
+
+    Returns ``{model: {key tuple: (revenue, units, orders)}}``. Products and
+    categories are attributed as they are now, not as they were at sale time.
+    """
+    since, until = day_bounds(first, last)
+    items = OrderItem.objects.filter(order__created_at__gte=since, order__created_at__lt=until)
+    items = items.annotate(day=TruncDate('order__created_at'))
+    result = {}
+    for model, keys, sources in ROLLUPS:
+        qs = items.filter(**{f'{source}__isnull': False for source in sources})
+        rows = qs.values('day', *sources).annotate(
+            revenue=Sum('subtotal'), units=Sum('quantity'), orders=Count('order', distinct=True)
+        ).order_by()
+        result[model] = {
+            (row['day'], *(row[s] for s in sources)): (row['revenue'], row['units'], row['orders'])
+            for row in rows
+        }
+    return result
+
+
+def reconcile(first, last, dry_run=False):
+    """Make the rollups for ``first``..``last`` match OrderItem.
+
+    Returns ``{model name: number of rows that were wrong or missing}``.
+    Checkouts bumping the rollups are held off until it commits, so an
+    order placed meanwhile is neither lost nor counted twice: SQLite takes
+    the write lock at BEGIN (``transaction_mode`` IMMEDIATE); on Postgres the
+    rollup tables are locked against writes before deriving.
+    """
+    drift = {}
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model, _, _ in ROLLUPS)
+            with connection.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE")
+        expected = derive(first, last)
+        for model, keys, _ in ROLLUPS:
+            existing = model.objects.filter(date__range=(first, last))
+            fields = [model._meta.get_field(f).attname for f in keys]
+            actual = {
+                tuple(row[:len(keys)]): tuple(row[len(keys):])
+                for row in existing.values_list(*fields, *COUNTERS)
+            }
+            wanted = expected[model]
+            drift[model.__name__] = sum(
+                1 for key in actual.keys() | wanted.keys() if actual.get(key) != wanted.get(key)
+            )
+            if drift[model.__name__] and not dry_run:
+                existing.delete()
+                model.objects.bulk_create([
+                    model(**dict(zip(fields, key)), **dict(zip(COUNTERS, counters)))
+                    for key, counters in wanted.items()
+                ], batch_size=1000)
+    return drift
+
+
+def dashboard_summary(days=30, top=5):
+    """Everything the dashboard sales panel shows, read only from the rollups."""
+    last = timezone.localdate()
+    first = last - timedelta(days=days - 1)
+    by_day = {row.date: row for row in DailySales.objects.filter(date__range=(first, last))}
+    daily = [by_day.get(first + timedelta(days=n)) or DailySales(date=first + timedelta(days=n))
+             for n in range(days)]
+    peak = max((d.revenue for d in daily), default=0) or 1
+    for d in daily:
+        d.bar = int(d.revenue * 100 / peak)
+
+    def leaders(model, *name):
+        return (model.objects.filter(date__range=(first, last)).values(*name)
+                .annotate(revenue=Sum('revenue'), units=Sum('units')).order_by('-revenue')[:top])
+
+    return {
+        'days': days,
+        'daily': daily,
+        'revenue': sum(d.revenue for d in daily),
+        'orders': sum(d.orders for d in daily),
+        'units': sum(d.units for d in daily),
+        'top_products': leaders(DailyProductSales, 'product_id', 'product__name'),
+        'top_categories': leaders(DailyCategorySales, 'category_id', 'category__name'),
+    }
@@ -0,0 +1,174 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchResults:
+    """Lazy, sliceable result set so it can be handed straight to Paginator.
+
+    Nothing hits the database until ``count()`` or a slice is requested, and
+    each slice loads only that page of products.
+    """
+
+    def __init__(self, backend, query):
+        self.backend = backend
+        self.query = query
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start = key.start or 0
+            stop = key.stop if key.stop is not None else self.count()
+            return self.backend.fetch(self.query, start, max(stop - start, 0))
+        results = self.backend.fetch(self.query, key, 1)
+        if not results:
+            raise IndexError(key)
+        return results[0]
+
+
+class BaseSearchBackend:
+    def search(self, query):
+        return SearchResults(self, query)
+
+    def count(self, query):
+        raise NotImplementedError
+
+    def fetch(self, query, offset, limit):
+        raise NotImplementedError
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        return 0
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Substring match on name/description. Works on any database, scans the table."""
+
+    def _queryset(self, query):
+        from ..models import Product
+        return Product.objects.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        ).order_by('name', 'id')
+
+    def count(self, query):
+        return self._queryset(query).count()
+
+    def fetch(self, query, offset, limit):
+        return list(self._queryset(query)[offset:offset + limit])
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Inverted index backed by an SQLite FTS5 virtual table.
+
+    Rows are keyed by the product id (FTS ``rowid``); results are ranked with
+    bm25, weighting name matches above description matches.  Every query term
+    is matched as a prefix, so "lap" finds "laptop".
+    """
+
+    table = 'E_commerce_product_fts'
+    name_weight = 10.0
+    description_weight = 1.0
+
+    def create_table(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+            f"USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def drop_table(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def match_expression(self, query):
+        tokens = TOKEN_RE.findall(query.lower())
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def count(self, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {self.table} WHERE {self.table} MATCH %s", [expression])
+            return cursor.fetchone()[0]
+
+    def fetch(self, query, offset, limit):
+        from ..models import Product
+        expression = self.match_expression(query)
+        if not expression or limit <= 0:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, %s, %s) LIMIT %s OFFSET %s",
+                [expression, self.name_weight, self.description_weight, limit, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        products = Product.objects.in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+    def index(self, products):
+        rows = [(p.id, p.name, p.description) for p in products]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(r[0],) for r in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, name, description) VALUES (%s, %s, %s)", rows
+            )
+
+    def remove(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+    def rebuild(self, batch_size=1000):
+        from ..models import Product
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.create_table(cursor)
+            cursor.execute(f"DELETE FROM {self.table}")
+            batch = []
+            rows = Product.objects.values_list('id', 'name', 'description').iterator(chunk_size=batch_size)
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._insert(cursor, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                self._insert(cursor, batch)
+                total += len(batch)
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return total
+
+    def _insert(self, cursor, rows):
+        cursor.executemany(f"INSERT INTO {self.table} (rowid, name, description) VALUES (%s, %s, %s)", rows)
+
+
+DEFAULT_BACKEND = 'E_commerce.utils.search.SQLiteFTSBackend'
+
+
+@lru_cache
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_search_backend():
+    return _load_backend(getattr(settings, 'SEARCH_BACKEND', DEFAULT_BACKEND))
@@ -0,0 +1,29 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+_state = threading.local()
+
+
+@contextmanager
+def signals_suspended():
+    """Silence the catalog receivers (search index, cache) in this thread.
+
+    For bulk jobs that save many rows and tidy up once at the end, e.g.
+    rebuilding the search index and bumping the cache after an import.
+    """
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def unless_suspended(receiver):
+    @wraps(receiver)
+    def wrapper(*args, **kwargs):
+        if getattr(_state, 'suspended', False):
+            return None
+        return receiver(*args, **kwargs)
+    return wrapper
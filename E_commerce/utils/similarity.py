@@ -0,0 +1,299 @@
+import functools
+import itertools
+import operator
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, namedtuple
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .tasks import run_in_background
+
+TOP_K = 8
+# Similarity cells (products x products) computed per block; bounds memory
+# at about 4 bytes each, whatever the catalog size.
+BLOCK_CELLS = 1 << 22
+# Name words count this many times more than description words.
+NAME_WEIGHT = 2
+# Others re-checked when one product changes: its best matches by this factor.
+REVERSE_CANDIDATES = 5
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to with your you our".split()
+)
+
+# Product ids (ascending), their TF-IDF rows and the vocabulary and idf the
+# rows were weighed with. rebuild() saves one for refresh_similar to reuse.
+Model = namedtuple('Model', 'ids vectors vocabulary idf')
+_model_lock = threading.Lock()
+_loaded = {}
+# Products with a refresh queued but not yet started.
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def tokens(name, description):
+    words = [w for w in TOKEN_RE.findall(name.lower()) if len(w) > 1 and w not in STOP_WORDS] * NAME_WEIGHT
+    words += [w for w in TOKEN_RE.findall(description.lower()) if len(w) > 1 and w not in STOP_WORDS]
+    return words
+
+
+def count_matrix(texts, vocabulary, grow=True):
+    """Raw term counts (SciPy CSR, float32), one row per ``(name, description)``.
+
+    New terms are added to ``vocabulary`` when ``grow``, dropped otherwise.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    indptr, indices, counts = [0], [], []
+    for name, description in texts:
+        for term, count in Counter(tokens(name, description or '')).items():
+            index = vocabulary.setdefault(term, len(vocabulary)) if grow else vocabulary.get(term)
+            if index is not None:
+                indices.append(index)
+                counts.append(count)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.array(counts, dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(vocabulary)),
+    )
+
+
+def weigh(counts, idf):
+    """Sublinear tf (1 + log tf) times ``idf``, rows L2-normalised."""
+    import numpy as np
+    from scipy import sparse
+
+    matrix = counts.copy()
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags((1 / norms).astype(np.float32)) @ matrix
+
+
+def tfidf(texts):
+    """``(rows, vocabulary, idf)``: L2-normalised TF-IDF rows for ``(name, description)`` pairs.
+
+    The idf is smoothed, so dot products of rows are cosine similarities in
+    [0, 1]. The vocabulary (term -> column) and idf vectorise later text
+    into the same space.
+    """
+    import numpy as np
+
+    vocabulary = {}
+    counts = count_matrix(texts, vocabulary)
+    df = np.bincount(counts.indices, minlength=len(vocabulary))
+    idf = (np.log((1 + counts.shape[0]) / (1 + df)) + 1).astype(np.float32)
+    return weigh(counts, idf), vocabulary, idf
+
+
+def catalog_vectors():
+    """A ``Model`` of every product, rows in id order."""
+    import numpy as np
+
+    from ..models import Product
+
+    rows = list(Product.objects.order_by('id').values_list('id', 'name', 'description').iterator(chunk_size=10000))
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    return Model(ids, *tfidf((name, description) for _, name, description in rows))
+
+
+def _model_path():
+    return Path(getattr(settings, 'SIMILARITY_MODEL_PATH', Path(settings.BASE_DIR) / '.cache' / 'similarity.npz'))
+
+
+def save_model(model):
+    """Write ``model`` where ``load_model`` finds it, replacing the old file in one step."""
+    import numpy as np
+
+    path = _model_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    vectors = model.vectors.tocsr()
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.npz', delete=False) as f:
+        np.savez(f, ids=model.ids, data=vectors.data, indices=vectors.indices, indptr=vectors.indptr,
+                 shape=np.array(vectors.shape), terms=np.array(list(model.vocabulary), dtype=str), idf=model.idf)
+    os.replace(f.name, path)
+
+
+def load_model():
+    """The model the last build saved, or None. Read once per process until the file changes."""
+    import numpy as np
+    from scipy import sparse
+
+    path = _model_path()
+    try:
+        stamp = (str(path), path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    with _model_lock:
+        if _loaded.get('stamp') != stamp:
+            with np.load(path) as saved:
+                vectors = sparse.csr_matrix((saved['data'], saved['indices'], saved['indptr']),
+                                            shape=tuple(saved['shape']))
+                vocabulary = {term: index for index, term in enumerate(saved['terms'].tolist())}
+                _loaded.update(stamp=stamp, model=Model(saved['ids'], vectors, vocabulary, saved['idf']))
+        return _loaded['model']
+
+
+def top_k_blocked(vectors, k=TOP_K, block_cells=BLOCK_CELLS):
+    """Yield ``(row, columns, scores)``: each row's ``k`` most similar other rows.
+
+    Similarities are computed a block of rows at a time (the sparse matrix
+    times the block's rows made dense, which is far faster than a sparse x
+    sparse product whose result is dense anyway) and the top k picked with
+    one argpartition per block, so there is no per-pair Python work and
+    memory stays bounded.
+    """
+    import numpy as np
+
+    n = vectors.shape[0]
+    k = min(k, n - 1)
+    if k < 1:
+        return
+    step = max(1, block_cells // n)
+    for start in range(0, n, step):
+        stop = min(n, start + step)
+        scores = np.ascontiguousarray((vectors @ vectors[start:stop].T.toarray()).T)
+        local = np.arange(stop - start)
+        scores[local, start + local] = -1  # never similar to itself
+        best = np.argpartition(scores, -k, axis=1)[:, -k:]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best, best_scores = np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+        for offset in range(stop - start):
+            keep = best_scores[offset] > 0
+            yield start + offset, best[offset][keep], best_scores[offset][keep]
+
+
+def rebuild(k=TOP_K, block_cells=BLOCK_CELLS, batch_size=5000):
+    """Replace SimilarProduct with every product's top ``k`` neighbours. Returns the row count.
+
+    All pairs are computed (as compact arrays, about 20 bytes each) before
+    the transaction opens, so the write lock is only held for the swap.
+    """
+    import numpy as np
+
+    from ..models import SimilarProduct
+
+    model = catalog_vectors()
+    ids = model.ids
+    products, others, scores = [], [], []
+    for row, columns, row_scores in top_k_blocked(model.vectors, k, block_cells):
+        products.append(np.full(len(columns), ids[row]))
+        others.append(ids[columns])
+        scores.append(row_scores)
+    products, others, scores = (np.concatenate(parts) if parts else np.empty(0) for parts in (products, others, scores))
+    with transaction.atomic():
+        SimilarProduct.objects.all().delete()
+        for start in range(0, len(products), batch_size):
+            stop = start + batch_size
+            SimilarProduct.objects.bulk_create([
+                SimilarProduct(product_id=product_id, other_id=other_id, score=score)
+                for product_id, other_id, score in zip(products[start:stop].tolist(), others[start:stop].tolist(),
+                                                        scores[start:stop].tolist())
+            ])
+    save_model(model)
+    return len(products)
+
+
+def queue_refresh(product_id):
+    """Run ``refresh_similar`` in the background, once however often the product
+    is saved before the queued run starts."""
+    if getattr(settings, 'BACKGROUND_TASKS', 'thread') == 'worker':
+        return  # nothing would run it; the next build_similar_products catches up
+    with _pending_lock:
+        if product_id in _pending:
+            return
+        _pending.add(product_id)
+    run_in_background(_refresh_pending, product_id)
+
+
+def _refresh_pending(product_id):
+    with _pending_lock:
+        _pending.discard(product_id)  # saves from now on need a run of their own
+    refresh_similar(product_id)
+
+
+def refresh_similar(product_id, k=TOP_K):
+    """Background task: re-score one product after its name or description changed.
+
+    Only the product's new text is vectorised, with the vocabulary and idf
+    of the saved model, and scored against the saved matrix (built in full
+    once if there is none yet). Replaces its own neighbours and updates the
+    lists of the products it is now most similar to (and of those that
+    listed it before). Other lists, and the saved matrix, keep their old
+    scores until the next ``build_similar_products`` run.
+    """
+    import numpy as np
+
+    from ..models import Product, SimilarProduct
+
+    text = Product.objects.filter(pk=product_id).values_list('name', 'description').first()
+    if text is None:
+        return False  # deleted meanwhile
+    model = load_model()
+    if model is None:
+        model = catalog_vectors()
+        save_model(model)
+    ids = model.ids
+    scores = model.vectors @ weigh(count_matrix([text], model.vocabulary, grow=False), model.idf).toarray().ravel()
+    row = np.searchsorted(ids, product_id)
+    if row < len(ids) and ids[row] == product_id:
+        scores[row] = 0
+    wanted = min(k * REVERSE_CANDIDATES, len(scores))
+    ranked = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < len(scores) else np.arange(len(scores))
+    ranked = ranked[np.argsort(-scores[ranked], kind='stable')]
+    ranked = ranked[scores[ranked] > 0]
+    # The saved matrix may still have products deleted since it was built.
+    live = set(Product.objects.filter(id__in=ids[ranked].tolist()).values_list('id', flat=True))
+    score_of = {int(ids[i]): float(scores[i]) for i in ranked if int(ids[i]) in live}
+
+    with transaction.atomic():
+        SimilarProduct.objects.filter(product_id=product_id).delete()
+        SimilarProduct.objects.bulk_create([
+            SimilarProduct(product_id=product_id, other_id=other, score=score)
+            for other, score in itertools.islice(score_of.items(), k)
+        ])
+
+        # Put the product into the lists it now belongs in, at its new score.
+        listed_before = set(SimilarProduct.objects.filter(other_id=product_id).values_list('product_id', flat=True))
+        SimilarProduct.objects.filter(other_id=product_id).delete()
+        candidates = listed_before | score_of.keys()
+        lists = {}
+        for pid, other, score in (SimilarProduct.objects.filter(product_id__in=candidates)
+                                  .values_list('product_id', 'other_id', 'score')):
+            lists.setdefault(pid, []).append((score, other))
+        added, dropped = [], []
+        for pid in candidates:
+            index = np.searchsorted(ids, pid)
+            if index == len(ids) or ids[index] != pid:
+                continue  # added after the vectors were built
+            score = float(scores[index])
+            current = sorted(lists.get(pid, []), reverse=True)
+            if score <= 0 or (len(current) >= k and score <= current[k - 1][0]):
+                continue
+            added.append(SimilarProduct(product_id=pid, other_id=product_id, score=score))
+            dropped += [(pid, other) for _, other in current[k - 1:]]
+        if dropped:
+            SimilarProduct.objects.filter(
+                functools.reduce(operator.or_, (Q(product_id=pid, other_id=other) for pid, other in dropped))
+            ).delete()
+        SimilarProduct.objects.bulk_create(added)
+    return True
+
+
+def similar_products(product, limit=4):
+    """Available products most like ``product``: one query on similar_product_top_idx."""
+    from ..models import SimilarProduct
+
+    return [
+        pair.other for pair in
+        SimilarProduct.objects.filter(product=product, other__available=True)
+        .select_related('other').order_by('-score', 'other_id')[:limit]
+    ]
@@ -0,0 +1,107 @@
+import re
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import BigIntegerField, CharField, Count, Max, Q
+from django.db.models.functions import Cast, Substr
+from django.db.models.lookups import Exact
+from django.utils.text import slugify
+
+# Room left in the column for "-<suffix>".
+SUFFIX_ROOM = 11
+# Bases per lookup query in assign_slugs; each adds one lookup to the WHERE.
+BATCH_BASES = 100
+SUFFIXED_RE = re.compile(r'(.+)-([0-9]+)')
+
+
+def base_slug(model, name, field='slug'):
+    max_length = model._meta.get_field(field).max_length
+    return (slugify(name) or model._meta.model_name)[:max_length - SUFFIX_ROOM].strip('-')
+
+
+def _suffixed(field, base):
+    """``base-<number>`` slugs, as a lookup the slug index can serve.
+
+    SQLite compares text bytewise, so they lie in the range ``base-0`` up to
+    ``base-:`` (``:`` sorts right after ``9``). Other databases may collate
+    punctuation away (Postgres under en_US.UTF-8), so there the range is a
+    prefix match, which Django backs with a pattern-ops index on the unique
+    slug column, narrowed by a regex.
+    """
+    if connection.vendor == 'sqlite':
+        # The range also holds "base-99-pack": keep only digits-only suffixes,
+        # those that survive a round trip through an integer unchanged.
+        suffix = _suffix(field, base)
+        return Q(**{f'{field}__gte': f'{base}-0', f'{field}__lt': f'{base}-:'}) & Q(
+            Exact(Cast(Cast(suffix, BigIntegerField()), CharField()), suffix)
+        )
+    return Q(**{f'{field}__startswith': f'{base}-', f'{field}__regex': rf'^{re.escape(base)}-[0-9]{{1,18}}$'})
+
+
+def _suffix(field, base):
+    return Substr(field, len(base) + 2)
+
+
+def _family(field, base):
+    """``base`` and its numbered forms."""
+    return Q(**{field: base}) | _suffixed(field, base)
+
+
+def unique_slug(model, name, field='slug'):
+    """Next free slug for ``name``: ``base``, then ``base-1``, ``base-2``...
+
+    One aggregate query on the slug index: whether the base is taken and the
+    highest number used after it, so the cost doesn't grow with how many
+    products share the name. Two concurrent callers can still get the same
+    answer, so the insert must be ready to retry on IntegrityError.
+    """
+    base = base_slug(model, name, field)
+    found = model._default_manager.filter(_family(field, base)).aggregate(
+        taken=Count('pk', filter=Q(**{field: base})),
+        top=Max(Cast(_suffix(field, base), BigIntegerField()), filter=_suffixed(field, base)),
+    )
+    if not found['taken']:
+        return base
+    return f"{base}-{(found['top'] or 0) + 1}"
+
+
+def assign_slugs(instances, field='slug'):
+    """Give every slug-less instance in a batch a unique slug before bulk_create.
+
+    Existing slugs for all the batch's bases are read in a few queries
+    (one per ``BATCH_BASES`` distinct names) and suffixes are handed out in
+    memory, so duplicates inside the batch get distinct slugs too.
+    """
+    pending = [obj for obj in instances if not getattr(obj, field)]
+    if not pending:
+        return instances
+    model = type(pending[0])
+    bases = {id(obj): base_slug(model, obj.name, field) for obj in pending}
+
+    taken = set()
+    top = defaultdict(int)  # base -> highest numeric suffix in use
+    distinct = sorted(set(bases.values()))
+    for start in range(0, len(distinct), BATCH_BASES):
+        chunk = set(distinct[start:start + BATCH_BASES])
+        lookup = Q()
+        for base in chunk:
+            lookup |= _family(field, base)
+        for slug in model._default_manager.filter(lookup).values_list(field, flat=True):
+            if slug in chunk:
+                taken.add(slug)
+                continue
+            match = SUFFIXED_RE.fullmatch(slug)
+            if match and match.group(1) in chunk:
+                top[match.group(1)] = max(top[match.group(1)], int(match.group(2)))
+
+    for obj in pending:
+        base = bases[id(obj)]
+        slug = base
+        # The loop only matters when one new name's slug looks like another's
+        # suffixed slug ("Shirt 2" vs the second "Shirt").
+        while slug in taken:
+            top[base] += 1
+            slug = f'{base}-{top[base]}'
+        taken.add(slug)
+        setattr(obj, field, slug)
+    return instances
@@ -0,0 +1,41 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'BACKGROUND_TASK_WORKERS', 2)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='eshop-task')
+    return _executor
+
+
+def _run(fn, args, kwargs):
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", fn.__name__)
+    finally:
+        # Worker threads open their own connections; don't leak them.
+        connections.close_all()
+
+
+def run_in_background(fn, *args, **kwargs):
+    """Run ``fn`` off the request path according to ``BACKGROUND_TASKS``.
+
+    ``'thread'`` hands it to an in-process thread pool, ``'sync'`` runs it
+    inline (tests), and ``'worker'`` does nothing because the work is left
+    queued in the database for a management command worker to pick up.
+    """
+    mode = getattr(settings, 'BACKGROUND_TASKS', 'thread')
+    if mode == 'sync':
+        fn(*args, **kwargs)
+    elif mode == 'thread':
+        _get_executor().submit(_run, fn, args, kwargs)
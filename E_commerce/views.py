@@ -1,74 +1,135 @@
-from .utils.invoice import generate_invoice_pdf
-from django.db.models import Q
+import json
+
+from .utils import catalog_cache, perf
+from .utils.inventory import OutOfStockError
+from .utils.invoice_queue import IN_FLIGHT, enqueue_invoice
+from .utils.order_export import FORMATS as EXPORT_FORMATS, export_lines, parse_range
+from .utils.orders import EmptyCartError, create_order, shipping_from_post, validate_shipping
+from .utils.pagination import InvalidCursor, KeysetPaginator
+from .utils.recommendations import bought_together
+from .utils.sales import dashboard_summary as sales_summary
+from .utils.search import get_search_backend
+from .utils.similarity import similar_products
 from django.shortcuts import render, get_object_or_404,redirect
-from .models import Product, Category,Order,OrderItem,Profile
+from .models import Product, Category,Order,Profile
 from django.core.paginator import Paginator
 from django.contrib import messages
-from decimal import Decimal
-from django.http import FileResponse,Http404,HttpResponse
+from django.http import FileResponse,Http404,HttpResponse,HttpResponseBadRequest,JsonResponse,StreamingHttpResponse
 
-from .forms import UserRegistrationForm, UserUpdateForm, ProfileForm,ProductForm
+from .forms import UserRegistrationForm, UserUpdateForm, ProfileForm,ProductForm,ProductFilterForm
 from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required,user_passes_test
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
+from django.views.decorators.http import require_POST
 
 def home(request):
     return render(request, 'home.html')
 
+def _keyset(request, qs, per_page, ordering=('-created_at', '-id')):
+    """Paginator plus the request's cursor in canonical form (safe to key a cache
+    on), dropping cursors that don't decode."""
+    paginator = KeysetPaginator(qs, per_page, ordering)
+    cursor = request.GET.get('cursor', '')
+    try:
+        if cursor:
+            cursor = paginator.normalize_cursor(cursor)
+    except InvalidCursor:
+        cursor = ''
+    return paginator, cursor
+
+def _category_nav(current_category=None):
+    return catalog_cache.get_or_render(
+        catalog_cache.listing_key('categories', 'nav', current_category.slug if current_category else ''),
+        'partials/category_nav.html',
+        lambda: {'categories': catalog_cache.category_tree(), 'current_category': current_category},
+    )
+
+def _page_context(paginator, cursor):
+    page_obj = paginator.get_page(cursor)
+    return {'products': page_obj.object_list, 'page_obj': page_obj}
+
 def products(request):
-    products = Product.objects.all()
-    return render(request, 'products.html', {'products': products})
+    product_grid = catalog_cache.get_or_render(
+        catalog_cache.listing_key('listing:all', 'everything'),
+        'partials/product_grid.html',
+        lambda: {'products': Product.objects.all()},
+    )
+    return render(request, 'products.html', {'product_grid': product_grid})
 
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug,available=True)
-    return render(request, 'product_details.html', {'product': product})
+    product = get_object_or_404(Product.objects.only('id', 'name', 'slug', 'stock'), slug=slug, available=True)
+    product_info = catalog_cache.get_or_render(
+        catalog_cache.product_key(slug),
+        'partials/product_info.html',
+        lambda: {'product': Product.objects.get(pk=product.pk)},
+    )
+    return render(request, 'product_details.html', {
+        'product': product,
+        'product_info': product_info,
+        'recommendations': bought_together(product),
+        'similar': similar_products(product),
+    })
 
 def product_list(request):
-    qs = Product.objects.filter(available=True).order_by('-created_at')
-    paginator = Paginator(qs, 12)
-    page = request.GET.get('page')
-    page_obj = paginator.get_page(page)
-
-    categories = Category.objects.all()
+    paginator, cursor = _keyset(request, Product.objects.filter(available=True), 12)
+    product_grid = catalog_cache.get_or_render(
+        catalog_cache.listing_key('listing:all', 'page', cursor),
+        'partials/product_grid.html',
+        lambda: _page_context(paginator, cursor),
+    )
     return render(request, 'products.html', {
-        'products': page_obj.object_list,
-        'page_obj': page_obj,
-        'categories': categories,
+        'product_grid': product_grid,
+        'category_nav': _category_nav(),
         'current_category': None,
     })
 
 def product_list_by_category(request, category_slug):
     category = get_object_or_404(Category, slug=category_slug)
-    qs = Product.objects.filter(category=category, is_active=True).order_by('-created_at')
-    paginator = Paginator(qs, 12)
-    page = request.GET.get('page')
-    page_obj = paginator.get_page(page)
-
-    categories = Category.objects.all()
+    paginator, cursor = _keyset(request, Product.objects.filter(category=category, available=True), 12)
+    product_grid = catalog_cache.get_or_render(
+        catalog_cache.listing_key(f'listing:category:{category.id}', 'list', cursor),
+        'partials/product_grid.html',
+        lambda: _page_context(paginator, cursor),
+    )
     return render(request, 'products.html', {
-        'products': page_obj.object_list,
-        'page_obj': page_obj,
-        'categories': categories,
+        'product_grid': product_grid,
+        'category_nav': _category_nav(category),
         'current_category': category,
     })
 
 def categories_list(request):
-    categories = Category.objects.all().order_by('name')
-    return render(request, 'categories.html', {'categories': categories})
+    category_grid = catalog_cache.get_or_render(
+        catalog_cache.listing_key('categories', 'grid'),
+        'partials/category_grid.html',
+        lambda: {'categories': catalog_cache.category_tree()},
+    )
+    return render(request, 'categories.html', {'category_grid': category_grid})
 
 def category_detail(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    products_qs = category.products.filter(available=True).order_by('-id')  # uses related_name
-
-    paginator = Paginator(products_qs, 8)   # 8 products per page
-    page = request.GET.get('page')
-    products = paginator.get_page(page)
+    # 8 products per page, newest id first, via the products related_name
+    paginator, cursor = _keyset(request, category.products.filter(available=True), 8, ordering=('-id',))
+    product_grid = catalog_cache.get_or_render(
+        catalog_cache.listing_key(f'listing:category:{category.id}', 'detail', cursor),
+        'partials/category_product_grid.html',
+        lambda: {'products': paginator.get_page(cursor)},
+    )
 
     return render(request, 'categories_detail.html', {
         'category': category,
-        'products': products
+        'product_grid': product_grid,
     })
 
+@user_passes_test(lambda u: u.is_superuser)
+def cache_stats(request):
+    return JsonResponse(catalog_cache.stats())
+
+@user_passes_test(lambda u: u.is_staff)
+def perf_stats(request):
+    if request.GET.get('reset'):
+        perf.stats.reset()
+    return JsonResponse(perf.stats.snapshot())
+
 def orderitems(request):
     return render(request, 'orderitems.html')
 
@@ -78,151 +139,166 @@ def privacy(request):
 def terms(request):
     return render(request, 'terms.html')
 
+def _quantity(value, default=1):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return default
+
 def add_to_cart(request, slug):
-    product = get_object_or_404(Product, slug=slug)
+    product = get_object_or_404(Product.objects.only('id'), slug=slug)
     if request.method == 'POST' or request.method == 'GET':
-        cart = request.session.get('cart', {})
-        pid = str(product.id)
-        cart[pid] = cart.get(pid, 0) + 1
-        request.session['cart'] = cart
-        request.session.modified = True
+        request.cart.add(product.id, _quantity(request.POST.get('quantity')))
         return redirect('orders')
 
     return redirect('products')
+
 def cart_view(request):
-    cart = request.session.get('cart', [])
-    products = Product.objects.filter(id__in=cart)
-    return render(request, 'cart.html', {'products': products})
+    items, total = request.cart.priced()
+    return render(request, 'cart.html', {'items': items, 'total': total})
 
 def orders(request):
-    cart = request.session.get('cart', {})  # cart is a dict: { '1': 2, '3': 1 }
-    items = []
-    total = Decimal('0.00')
-
-    if cart:
-        product_ids = [int(pid) for pid in cart.keys()]
-        products = Product.objects.filter(id__in=product_ids)
-        product_map = {p.id: p for p in products}
-
-        for pid_str, qty in cart.items():
-            pid = int(pid_str)
-            p = product_map.get(pid)
-            if not p:
-                continue
-            quantity = int(qty)
-            subtotal = p.price * quantity
-            total += subtotal
-            items.append({
-                'product': p,
-                'quantity': quantity,
-                'subtotal': subtotal,
-            })
+    items, total = request.cart.priced()
 
     return render(request, 'orders.html', {
         'items': items,
         'total': total,
     })
 
+def _cart_product_id(request):
+    try:
+        return int(request.POST.get('product_id'))
+    except (TypeError, ValueError):
+        return None
+
 def update_cart(request):
     if request.method != 'POST':
         return redirect('orders')
 
-    cart = request.session.get('cart', {})
-    product_id = str(request.POST.get('product_id'))
+    product_id = _cart_product_id(request)
     action = request.POST.get('action')
     quantity = request.POST.get('quantity', 1)
 
     if action == 'update':
         try:
-            quantity = int(quantity)
-            if quantity < 1:
-                quantity = 1
-            if product_id in cart:
-                cart[product_id] = quantity
+            if request.cart.update(product_id, int(quantity)):
                 messages.success(request, "Cart updated successfully!")
         except ValueError:
             messages.error(request, "Invalid quantity value.")
     elif action == 'remove':
-        if product_id in cart:
-            del cart[product_id]
+        if request.cart.remove(product_id):
             messages.success(request, "Item removed from cart.")
 
-    request.session['cart'] = cart
-    request.session.modified = True
     return redirect('orders')
 
+# JSON cart API: the same operations as the forms above, answering with the
+# changed line and the new totals so the page can update in place.
+
+def _line_json(item):
+    return {
+        'product_id': item['product'].id,
+        'name': item['product'].name,
+        'quantity': item['quantity'],
+        'price': str(item['product'].price),
+        'subtotal': str(item['subtotal']),
+    }
+
+def _cart_json(request, product_id=None, lines=False, status=200):
+    items, total = request.cart.priced()
+    data = {'cart': {
+        'lines': len(items),
+        'count': sum(it['quantity'] for it in items),
+        'total': str(total),
+    }}
+    if lines:
+        data['cart']['items'] = [_line_json(it) for it in items]
+    if product_id is not None:
+        line = next((it for it in items if it['product'].id == product_id), None)
+        data['line'] = _line_json(line) if line else None
+    return JsonResponse(data, status=status)
+
+def _api_payload(request):
+    """POST form data or a JSON object body; None if the body isn't valid."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+def _api_error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+def cart_api(request):
+    return _cart_json(request, lines=True)
+
+@require_POST
+def cart_api_add(request):
+    data = _api_payload(request)
+    if data is None:
+        return _api_error("Invalid JSON body.")
+    try:
+        product_id = int(data.get('product_id'))
+    except (TypeError, ValueError):
+        return _api_error("product_id is required.")
+    if not Product.objects.filter(pk=product_id, available=True).exists():
+        return _api_error("No such product.", status=404)
+    request.cart.add(product_id, _quantity(data.get('quantity')))
+    return _cart_json(request, product_id)
+
+@require_POST
+def cart_api_update(request):
+    data = _api_payload(request)
+    if data is None:
+        return _api_error("Invalid JSON body.")
+    try:
+        product_id, quantity = int(data.get('product_id')), int(data.get('quantity'))
+    except (TypeError, ValueError):
+        return _api_error("product_id and quantity must be numbers.")
+    if not request.cart.update(product_id, quantity):
+        return _api_error("That product isn't in your cart.", status=404)
+    return _cart_json(request, product_id)
+
+@require_POST
+def cart_api_remove(request):
+    data = _api_payload(request)
+    if data is None:
+        return _api_error("Invalid JSON body.")
+    try:
+        product_id = int(data.get('product_id'))
+    except (TypeError, ValueError):
+        return _api_error("product_id is required.")
+    request.cart.remove(product_id)
+    return _cart_json(request, product_id)
+
 def checkout(request):
-    cart = request.session.get('cart', {})
+    cart = request.cart.lines
     if not cart:
         messages.error(request, "Your cart is empty.")
         return redirect('products')
 
-    product_ids = [int(pid) for pid in cart.keys()]
-    products = Product.objects.filter(id__in=product_ids)
-    product_map = {p.id: p for p in products}
-
-    items = []
-    total = Decimal('0.00')
-    for pid_str, qty in cart.items():
-        pid = int(pid_str)
-        p = product_map.get(pid)
-        if not p:
-            continue
-        subtotal = p.price * qty
-        total += subtotal
-        items.append({'product': p, 'quantity': qty, 'subtotal': subtotal})
+    items, total = request.cart.priced()
 
     if request.method == 'POST':
-        full_name = request.POST.get('full_name', '').strip()
-        phone = request.POST.get('phone', '').strip()
-        address_line1 = request.POST.get('address_line1', '').strip()
-        city = request.POST.get('city', '').strip()
-        state = request.POST.get('state', '').strip()
-        postal_code = request.POST.get('postal_code', '').strip()
-
-        if not full_name:
-            messages.error(request, "Name is required.")
-        elif not phone:
-            messages.error(request, "Phone number is required.")
-        elif not phone.isdigit() or len(phone) != 10:
-            messages.error(request, "Phone number must be 10 digits.")
-        elif not address_line1:
-            messages.error(request, "Address is required.")
-        elif not city:
-            messages.error(request, "City is required.")
-        elif not state:
-            messages.error(request, "State is required.")
-        elif not postal_code:
-            messages.error(request, "Postal code is required.")
+        shipping = shipping_from_post(request.POST)
+        error = validate_shipping(shipping)
+        if error:
+            messages.error(request, error)
         else:
-            order = Order.objects.create(
-                full_name=full_name,
-                phone=phone,
-                address_line1=address_line1,
-                city=city,
-                state=state,
-                postal_code=postal_code,
-                total_amount=total,
-                details = [{
-                'product': it['product'].name,
-                'quantity': it['quantity'],
-                'price': float(it['product'].price),
-                'subtotal': float(it['subtotal']),
-            } for it in items]
-            )
-
-            for it in items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=it['product'],
-                    quantity=it['quantity'],
-                    price=it['product'].price,
-                    subtotal=it['subtotal']
-                )
-        pdf_bytes = generate_invoice_pdf(order)
-        response = HttpResponse(pdf_bytes, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="invoice_{order.id}.pdf"'
-        return response
+            try:
+                order = create_order(cart, shipping)
+            except EmptyCartError as exc:
+                messages.error(request, str(exc))
+                return redirect('products')
+            except OutOfStockError as exc:
+                messages.error(request, str(exc))
+                return redirect('orders')
+
+            # The PDF is rendered off the request path; checkout_success links to it.
+            enqueue_invoice(order)
+            request.cart.clear()
+            return redirect('checkout_success', order_id=order.id)
 
     return render(request, 'checkout.html', {
         'items': items,
@@ -231,64 +307,25 @@ def checkout(request):
     })
 
 def checkout_success(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.with_items(), id=order_id)
     return render(request, 'checkout_success.html', {'order': order})
 
 def place_order(request):
     if request.method == 'POST':
-        full_name = request.POST.get('full_name', '').strip()
-        phone = request.POST.get('phone', '').strip()
-        address1 = request.POST.get('address_line1', '').strip()
-        address2 = request.POST.get('address_line2', '').strip()
-        city = request.POST.get('city', '').strip()
-        state = request.POST.get('state', '').strip()
-        postal_code = request.POST.get('postal_code', '').strip()
-
-        cart = request.session.get('cart', {})
-        total = 0
-
-        for product_id, quantity in cart.items():
-            try:
-                product = Product.objects.get(id=int(product_id))
-                total += product.price * int(quantity)
-            except Product.DoesNotExist:
-                continue
-
-        if not full_name:
-            messages.error(request, "Full name is required.")
-        elif not phone.isdigit() or len(phone) != 10:
-            messages.error(request, "Phone number must be 10 digits.")
-        elif not address1 or not city or not state or not postal_code:
-            messages.error(request, "All address fields are required.")
+        shipping = shipping_from_post(request.POST)
+        error = validate_shipping(shipping)
+        if error:
+            messages.error(request, error)
         else:
-            order = Order.objects.create(
-                full_name=full_name,
-                phone=phone,
-                address_line1=address1,
-                address_line2=address2,
-                city=city,
-                state=state,
-                postal_code=postal_code,
-                total_amount=total
-            )
-
-            for product_id, quantity in cart.items():
-                try:
-                    product = Product.objects.get(id=int(product_id))
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        quantity=quantity,
-                        price=product.price,
-                        subtotal=product.price * int(quantity)
-                    )
-                except Product.DoesNotExist:
-                    continue
-
-            request.session['cart'] = {}
-            from django.urls import reverse
-            url = reverse('checkout_success', args=[order.id])
-            return redirect(url)
+            try:
+                order = create_order(request.cart.lines, shipping)
+            except (EmptyCartError, OutOfStockError) as exc:
+                messages.error(request, str(exc))
+                return redirect('cart')
+
+            enqueue_invoice(order)
+            request.cart.clear()
+            return redirect('checkout_success', order_id=order.id)
 
         messages.error(request, "Please correct the errors below.")
 
@@ -296,13 +333,30 @@ def place_order(request):
 
 def download_invoice(request, order_id):
     order = get_object_or_404(Order, id=order_id)
-    if not order.invoice:
-        pdf_bytes = generate_invoice_pdf(order)
-        return HttpResponse(pdf_bytes, content_type='application/pdf')
-    try:
-        return FileResponse(order.invoice.open('rb'), as_attachment=True, filename=f"invoice_{order.id}.pdf")
-    except FileNotFoundError:
-        raise Http404("Invoice not found")
+    if order.invoice:
+        try:
+            return FileResponse(order.invoice.open('rb'), as_attachment=True, filename=f"invoice_{order.id}.pdf")
+        except FileNotFoundError:
+            pass
+
+    # A failed render is only retried when asked (the form on the failed
+    # page posts here), not on every auto-refresh of the pending page.
+    failed = order.invoice_status == Order.InvoiceStatus.FAILED
+    if request.method == 'POST' and failed:
+        enqueue_invoice(order)
+        return redirect('download_invoice', order_id=order.id)
+    if failed:
+        return render(request, 'invoice_pending.html', {'order': order, 'failed': True}, status=500)
+
+    if order.invoice_status not in IN_FLIGHT:
+        enqueue_invoice(order)
+        order.refresh_from_db(fields=['invoice', 'invoice_status'])
+        if order.invoice:
+            return FileResponse(order.invoice.open('rb'), as_attachment=True, filename=f"invoice_{order.id}.pdf")
+
+    response = render(request, 'invoice_pending.html', {'order': order}, status=202)
+    response['Retry-After'] = '2'
+    return response
 
 def signup_view(request):
     """Handles user registration"""
@@ -388,23 +442,51 @@ def search_products(request):
     if not query:
         return redirect('products')
 
-    results = Product.objects.filter(
-        Q(name__icontains=query) | Q(description__icontains=query)
-    )
+    results = get_search_backend().search(query)
+    paginator = Paginator(results, 12)
+    page_obj = paginator.get_page(request.GET.get('page'))
 
-    if results.count() == 1:
-        product = results.first()
+    if paginator.count == 1:
+        product = page_obj.object_list[0]
         return redirect('product_detail', slug=product.slug)
 
     return render(request, 'search_results.html', {
         'query': query,
-        'results': results
+        'results': page_obj.object_list,
+        'page_obj': page_obj,
     })
 
 @user_passes_test(lambda u: u.is_superuser)
 def admin_dashboard(request):
-    products = Product.objects.all()
-    return render(request, 'admin_dashboard/dashboard.html', {'products': products})
+    form = ProductFilterForm(request.GET)
+    products = form.filter(
+        Product.objects.select_related('category')
+        .only('name', 'slug', 'price', 'available', 'stock', 'created_at', 'category__name')
+    )
+    page_obj = Paginator(products, 25).get_page(request.GET.get('page'))
+    return render(request, 'admin_dashboard/dashboard.html', {
+        'products': page_obj.object_list,
+        'page_obj': page_obj,
+        'filter_form': form,
+        'sort': form.cleaned_data.get('sort') or '-created_at',
+        'sales': sales_summary(),
+    })
+
+@user_passes_test(lambda u: u.is_staff)
+def export_orders(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be csv or jsonl")
+    start, end = request.GET.get('start', ''), request.GET.get('end', '')
+    try:
+        since, until = parse_range(start, end)
+    except ValueError:
+        return HttpResponseBadRequest("start and end must be YYYY-MM-DD dates")
+
+    response = StreamingHttpResponse(export_lines(fmt, since, until), content_type=EXPORT_FORMATS[fmt])
+    filename = '-'.join(['orders', *filter(None, [start, end])])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
 
 @user_passes_test(lambda u: u.is_superuser)
 def add_product(request):
@@ -52,11 +52,13 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 
 MIDDLEWARE = [
+    'E_commerce.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'E_commerce.middleware.CartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,7 +67,7 @@ ROOT_URLCONF = 'E_commerceproject.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'E_commerce.utils.perf.TimedDjangoTemplates',
         'DIRS': ['templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,9 +90,58 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent checkouts queue on the
+            # busy timeout instead of failing with "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file (not shared-cache memory) so threaded tests see real locking.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Optional Postgres, e.g. for running the stock contention tests against it.
+if os.environ.get('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ['POSTGRES_DB'],
+        'USER': os.environ.get('POSTGRES_USER', ''),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+    }
+
+
+# Caching
+# The catalog cache holds rendered listing/product fragments. Pick 'locmem'
+# (per process) or 'file' (shared by all workers on the host) with
+# CATALOG_CACHE_BACKEND.
+
+CATALOG_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eshop-catalog',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'catalog',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eshop-default',
+    },
+    'catalog': CATALOG_CACHE_BACKENDS[os.environ.get('CATALOG_CACHE_BACKEND', 'locmem')],
+}
+CATALOG_CACHE_ALIAS = 'catalog'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,6 +191,40 @@ LOGOUT_REDIRECT_URL = 'home'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Product search: SQLiteFTSBackend keeps an FTS5 index in sync with Product;
+# SimpleSearchBackend falls back to icontains scans on other databases (the
+# FTS5 table is only created on SQLite).
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    SEARCH_BACKEND = 'E_commerce.utils.search.SQLiteFTSBackend'
+else:
+    SEARCH_BACKEND = 'E_commerce.utils.search.SimpleSearchBackend'
+
+# Background work (invoices, thumbnails, similar-product refreshes):
+# 'thread' runs it in an in-process pool, 'worker' leaves it to the
+# invoice_worker, generate_thumbnails and build_similar_products commands,
+# 'sync' runs it inline.
+BACKGROUND_TASKS = 'thread'
+BACKGROUND_TASK_WORKERS = 2
+
+# TF-IDF model saved by build_similar_products; single-product refreshes
+# vectorise against it instead of the whole catalog.
+SIMILARITY_MODEL_PATH = BASE_DIR / '.cache' / 'similarity.npz'
+
+# Cart storage (see E_commerce/utils/cart.py): 'cookie' keeps the cart in a
+# signed cookie, 'cache' in CART_CACHE_ALIAS under a cookie id, 'session' in
+# the session, 'db' in Cart/CartItem. CART_USER_STORAGE is used for
+# signed-in users; their anonymous cart is merged into it on login.
+CART_STORAGE = os.environ.get('CART_STORAGE', 'cookie')
+CART_USER_STORAGE = 'db'
+CART_CACHE_ALIAS = 'default'
+
+# Request instrumentation (E_commerce.middleware.PerformanceMiddleware):
+# queries slower than PERF_SLOW_QUERY_MS are logged to E_commerce.utils.perf;
+# PERF_SERVER_TIMING adds the Server-Timing header to responses (only with
+# DEBUG on or for staff users).
+PERF_SLOW_QUERY_MS = 100
+PERF_SERVER_TIMING = True
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 